@@ -1,17 +1,27 @@
-from datetime import datetime, timedelta
-from typing import Optional
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Tuple
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
+import hashlib
 import os
+import secrets
+import uuid
 import models
 from database import get_db
+from ids import is_uuid, new_id
+from key_filter import api_key_filter
+from token_cache import api_key_tiers, is_revoked, revoke_user_tokens, verified_tokens
 
 SECRET_KEY = os.getenv("JWT_SECRET_KEY", "your-secret-key-change-in-production")
 ALGORITHM = os.getenv("JWT_ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "1440"))
+REFRESH_TOKEN_EXPIRE_DAYS = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", "30"))
+# A rotated refresh token presented again this soon is taken as a retry after a lost response
+REFRESH_TOKEN_REUSE_GRACE_SECONDS = int(os.getenv("REFRESH_TOKEN_REUSE_GRACE_SECONDS", "10"))
+API_KEY_PREFIX = "sk_"
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 security = HTTPBearer()
@@ -24,33 +34,133 @@ def get_password_hash(password: str) -> str:
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
+    now = datetime.utcnow()
     if expires_delta:
-        expire = datetime.utcnow() + expires_delta
+        expire = now + expires_delta
     else:
-        expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    to_encode.update({"exp": expire})
+        expire = now + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    # Millisecond iat (a JWT NumericDate may be fractional) so revocation cutoffs can tell apart tokens issued in the same second
+    to_encode.update({"exp": expire, "iat": round(now.replace(tzinfo=timezone.utc).timestamp(), 3)})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-def verify_token(token: str) -> dict:
+def hash_refresh_token(token: str) -> str:
+    # Refresh tokens are random, so a plain digest is enough; only digests are stored
+    return hashlib.sha256(token.encode()).hexdigest()
+
+def create_refresh_token(user_id: str, db: Session, family_id: Optional[str] = None) -> Tuple[str, models.RefreshToken]:
+    """Store a new refresh token; the caller commits. Rotations stay in the same family."""
+    token = secrets.token_urlsafe(32)
+    record = models.RefreshToken(
+        id=new_id(),
+        user_id=user_id,
+        token_hash=hash_refresh_token(token),
+        family_id=family_id or str(uuid.uuid4()),
+        expires_at=datetime.utcnow() + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
+    )
+    db.add(record)
+    return token, record
+
+def rotate_refresh_token(token: str, db: Session) -> Tuple[models.User, str, str]:
+    """Exchange a refresh token for a new one; returns the user, the new token and its family
+
+    A token that was already rotated gets its successor replaced if it comes
+    back within the grace window while the successor is unused. Any other
+    reuse revokes the token's family.
+    """
+    invalid = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Invalid refresh token",
+    )
+    now = datetime.utcnow()
+    record = db.query(models.RefreshToken).filter(
+        models.RefreshToken.token_hash == hash_refresh_token(token),
+        models.RefreshToken.expires_at > now
+    ).first()
+    if record is None:
+        raise invalid
+    if record.revoked_at is not None:
+        # Includes successors replaced during a grace window, so a thief who
+        # retried first is cut off once the real client comes back
+        revoke_refresh_family(record, now, db)
+        raise invalid
+
+    # Claim the token in one UPDATE so concurrent refreshes cannot both rotate it
+    claimed = db.query(models.RefreshToken).filter(
+        models.RefreshToken.id == record.id,
+        models.RefreshToken.used_at.is_(None)
+    ).update({"used_at": now}, synchronize_session=False)
+    if not claimed:
+        db.refresh(record)
+        retried = record.replaced_by is not None and db.query(models.RefreshToken.id).filter(
+            models.RefreshToken.id == record.id,
+            models.RefreshToken.used_at > now - timedelta(seconds=REFRESH_TOKEN_REUSE_GRACE_SECONDS)
+        ).first() is not None
+        # The successor is swapped only while unused, so an older token in the family never qualifies
+        if not retried or not db.query(models.RefreshToken).filter(
+            models.RefreshToken.id == record.replaced_by,
+            models.RefreshToken.used_at.is_(None),
+            models.RefreshToken.revoked_at.is_(None)
+        ).update({"revoked_at": now}, synchronize_session=False):
+            # A rotated token came back: assume it leaked and end this login's session
+            revoke_refresh_family(record, now, db)
+            raise invalid
+
+    new_token, successor = create_refresh_token(record.user_id, db, record.family_id)
+    record.replaced_by = successor.id
+    db.commit()
+    return record.user, new_token, record.family_id
+
+def revoke_refresh_family(record: models.RefreshToken, now: datetime, db: Session):
+    """Revoke every refresh token of a login and the access tokens issued from it"""
+    db.query(models.RefreshToken).filter(
+        models.RefreshToken.family_id == record.family_id,
+        models.RefreshToken.revoked_at.is_(None)
+    ).update({"revoked_at": now}, synchronize_session=False)
+    db.commit()
+    revoke_user_tokens(record.user_id, ACCESS_TOKEN_EXPIRE_MINUTES * 60, record.family_id)
+
+def verify_token(token: str, check_revocation: bool = True) -> dict:
+    # Clients reuse the same token many times; skip the signature check for ones already verified
+    payload = verified_tokens.get(token)
+    if payload is not None:
+        return payload
+
+    invalid = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Invalid authentication credentials",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        return payload
     except JWTError:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid authentication credentials",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
+        raise invalid
+
+    # Only tokens checked against revocations may enter the cache
+    if check_revocation:
+        if is_revoked(payload):
+            raise invalid
+        verified_tokens.put(token, payload)
+    return payload
 
 def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
     db: Session = Depends(get_db)
 ):
     token = credentials.credentials
+    if token.startswith(API_KEY_PREFIX):
+        user = verify_api_key(token, db)
+        if user is None:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Invalid API key",
+                headers={"WWW-Authenticate": "Bearer"},
+            )
+        return user
+
     payload = verify_token(token)
     user_id: str = payload.get("sub")
-    if user_id is None:
+    if user_id is None or not is_uuid(user_id):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid authentication credentials",
@@ -66,6 +176,10 @@ def get_current_user(
     return user
 
 def verify_api_key(api_key: str, db: Session) -> Optional[models.User]:
+    # Keys that were never issued are turned away before they cost a query
+    if not api_key_filter.might_contain(api_key):
+        return None
+
     key = db.query(models.APIKey).filter(
         models.APIKey.key == api_key,
         models.APIKey.is_active == True
@@ -77,4 +191,8 @@ def verify_api_key(api_key: str, db: Session) -> Optional[models.User]:
     key.last_used_at = datetime.utcnow()
     db.commit()
 
+    api_key_tiers.put(api_key, {"sub": key.user.id, "tier": tier_name(key.user.tier)})
     return key.user
+
+def tier_name(tier) -> Optional[str]:
+    return tier.value if isinstance(tier, models.TierEnum) else tier
@@ -0,0 +1,99 @@
+"""
+Cost of verifying one HS256 access token with each available JWT library
+
+Compares the python-jose path used by auth.verify_token with PyJWT, joserfc
+and Authlib (whichever are installed), and with a hit in the verified-token
+cache:
+
+    pip install pyjwt joserfc authlib
+    python benchmarks/jwt_verify.py --iterations 20000
+
+Every verifier checks the signature and the exp claim, which is the work
+verify_token needs done.
+"""
+
+import argparse
+import os
+import sys
+import time
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+import auth
+from token_cache import VerifiedTokenCache
+
+
+def jose_verifier(token):
+    from jose import jwt
+    return lambda: jwt.decode(token, auth.SECRET_KEY, algorithms=[auth.ALGORITHM])
+
+
+def pyjwt_verifier(token):
+    import jwt
+    return lambda: jwt.decode(token, auth.SECRET_KEY, algorithms=[auth.ALGORITHM])
+
+
+def joserfc_verifier(token):
+    from joserfc import jwt
+    from joserfc.jwk import OctKey
+    key = OctKey.import_key(auth.SECRET_KEY)
+    registry = jwt.JWTClaimsRegistry(exp={"essential": True})
+
+    def verify():
+        claims = jwt.decode(token, key, algorithms=[auth.ALGORITHM]).claims
+        registry.validate(claims)
+        return claims
+    return verify
+
+
+def authlib_verifier(token):
+    from authlib.jose import jwt
+    key = auth.SECRET_KEY.encode()
+
+    def verify():
+        claims = jwt.decode(token, key)
+        claims.validate()
+        return claims
+    return verify
+
+
+def cache_hit_verifier(token):
+    cache = VerifiedTokenCache()
+    cache.put(token, auth.verify_token(token, check_revocation=False))
+    return lambda: cache.get(token)
+
+
+VERIFIERS = [
+    ("python-jose (current)", jose_verifier),
+    ("PyJWT", pyjwt_verifier),
+    ("joserfc", joserfc_verifier),
+    ("Authlib", authlib_verifier),
+    ("verified-token cache hit", cache_hit_verifier),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=20000)
+    args = parser.parse_args()
+
+    token = auth.create_access_token({"sub": "bench-user", "tier": "pro"})
+    print(f"{'verifier':<26} {'us/token':>9} {'tokens/s':>10}")
+    for name, build in VERIFIERS:
+        try:
+            verify = build(token)
+            claims = verify()
+        except ImportError:
+            print(f"{name:<26} {'not installed':>20}")
+            continue
+        assert claims["sub"] == "bench-user"
+
+        best = min(timeit.repeat(verify, number=args.iterations, repeat=3, timer=time.perf_counter))
+        per_token = best / args.iterations
+        print(f"{name:<26} {per_token * 1e6:>9.1f} {1 / per_token:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Latency percentiles from raw samples versus the per-tenant sketch
+
+Draws response times from a long-tailed distribution and compares exact
+percentiles over the raw samples (what a query over usage_logs rows would
+have to do) with the logarithmic-bucket sketch kept by latency.py:
+
+    python benchmarks/latency_sketch.py --samples 1000000
+
+Reports the cost of recording one sample, the cost of a summary and the
+relative error of each percentile.
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+import timeit
+from collections import Counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from latency import PERCENTILES, bucket_index, quantiles
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--samples", type=int, default=1000000)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    samples = [rng.lognormvariate(3.0, 0.8) for _ in range(args.samples)]
+
+    start = time.perf_counter()
+    ordered = sorted(samples)
+    exact = {p: ordered[int(p / 100 * (len(ordered) - 1))] for p in PERCENTILES}
+    exact_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    sketch = Counter(bucket_index(ms) for ms in samples)
+    record_time = time.perf_counter() - start
+
+    estimates = quantiles(sketch)
+    summary_time = min(timeit.repeat(lambda: quantiles(sketch), number=100, repeat=3)) / 100
+
+    print(f"{args.samples} samples, {len(sketch)} sketch buckets")
+    print(f"exact (sort raw samples)  {exact_time * 1e3:>9.1f} ms")
+    print(f"sketch record per sample  {record_time / args.samples * 1e9:>9.0f} ns")
+    print(f"sketch summary            {summary_time * 1e3:>9.3f} ms")
+    for p in PERCENTILES:
+        estimate = estimates[f"p{p}_ms"]
+        print(f"p{p:<3} exact {exact[p]:>8.2f} ms  sketch {estimate:>8.2f} ms"
+              f"  error {abs(estimate - exact[p]) / exact[p]:>6.2%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""
+Simulated overload test for AdaptiveConcurrencyMiddleware
+
+Drives an in-process ASGI app with fixed capacity (a semaphore in front of
+per-route service times, from 10 ms reads to bcrypt-bound logins and
+Stripe-bound payments) with open-loop arrivals at 1x and 2x its rated load
+(80% utilisation), with and without the middleware, and reports latency of
+admitted requests per priority class:
+
+    python benchmarks/load_shedding.py --capacity 8 --seconds 10
+
+It first sends slow requests one after another, with no overload, and
+reports the limit afterwards; it should not move.
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+import auth
+from load_shedding import AdaptiveConcurrencyMiddleware, AIMDLimit, classify
+
+# (share of traffic, method, path, tier, service ms)
+TRAFFIC_MIX = [
+    (0.05, "POST", "/payments", "pro", 400),
+    (0.05, "POST", "/auth/login", None, 320),
+    (0.10, "GET", "/api-keys", "enterprise", 15),
+    (0.45, "GET", "/api-keys", "pro", 15),
+    (0.05, "POST", "/batch", "pro", 120),
+    (0.30, "GET", "/usage", "free", 10),
+]
+SERVICE_TIMES = {(method, path): ms / 1000 for _, method, path, _, ms in TRAFFIC_MIX}
+
+
+def make_app(capacity):
+    workers = asyncio.Semaphore(capacity)
+
+    async def app(scope, receive, send):
+        async with workers:
+            await asyncio.sleep(SERVICE_TIMES[(scope["method"], scope["path"])])
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"{}"})
+
+    return app
+
+
+async def run(app, rate, seconds, tokens):
+    samples = []
+
+    async def one(method, path, token):
+        status = {}
+
+        async def send(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+
+        async def receive():
+            return {"type": "http.request", "body": b""}
+
+        headers = [(b"authorization", f"Bearer {token}".encode())] if token else []
+        scope = {"type": "http", "method": method, "path": path, "headers": headers}
+        priority = classify(method, path, auth.verify_token(token).get("tier") if token else None)
+        start = time.perf_counter()
+        await app(scope, receive, send)
+        samples.append((priority, status["code"], time.perf_counter() - start))
+
+    rng = random.Random(1)
+    tasks = []
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pick = rng.random()
+        for share, method, path, tier, _ in TRAFFIC_MIX:
+            pick -= share
+            if pick <= 0:
+                break
+        tasks.append(asyncio.ensure_future(one(method, path, tokens[tier])))
+        await asyncio.sleep(rng.expovariate(rate))
+    await asyncio.gather(*tasks)
+    return samples
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))] if values else 0.0
+
+
+def report(label, samples):
+    print(f"\n{label}")
+    print(f"  {'class':<9} {'requests':>9} {'shed':>7} {'p50 ms':>9} {'p99 ms':>9}")
+    for priority in sorted({p for p, _, _ in samples}):
+        group = [(code, latency) for p, code, latency in samples if p == priority]
+        admitted = [latency for code, latency in group if code != 503]
+        shed = sum(1 for code, _ in group if code == 503)
+        print(
+            f"  {priority.name.lower():<9} {len(group):>9} {shed / len(group):>7.1%} "
+            f"{percentile(admitted, 0.50) * 1000:>9.1f} {percentile(admitted, 0.99) * 1000:>9.1f}"
+        )
+
+
+async def sequential(app, count):
+    for i in range(count):
+        method, path = ("POST", "/auth/login") if i % 2 else ("POST", "/batch")
+        scope = {"type": "http", "method": method, "path": path, "headers": []}
+
+        async def receive():
+            return {"type": "http.request", "body": b""}
+
+        async def send(message):
+            pass
+
+        await app(scope, receive, send)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--capacity", type=int, default=8, help="requests the fake app serves concurrently")
+    parser.add_argument("--seconds", type=float, default=10.0)
+    args = parser.parse_args()
+
+    mean_service = sum(share * ms / 1000 for share, _, _, _, ms in TRAFFIC_MIX)
+    rated = 0.8 * args.capacity / mean_service
+    tokens = {
+        tier: auth.create_access_token({"sub": f"bench-{tier}", "tier": tier}) if tier else None
+        for _, _, _, tier, _ in TRAFFIC_MIX
+    }
+    print(f"capacity {args.capacity}, mean service {mean_service * 1000:.0f} ms, rated load {rated:.0f} req/s")
+
+    idle_app = AdaptiveConcurrencyMiddleware(make_app(args.capacity), AIMDLimit(initial_limit=args.capacity))
+    asyncio.run(sequential(idle_app, 50))
+    print(f"50 sequential logins and batches, no overload: limit {args.capacity} -> {idle_app.limit.limit:.1f}")
+
+    for multiplier in (1, 2):
+        rate = rated * multiplier
+        plain = asyncio.run(run(make_app(args.capacity), rate, args.seconds, tokens))
+        report(f"{multiplier}x load, no limiter", plain)
+
+        limited_app = AdaptiveConcurrencyMiddleware(make_app(args.capacity), AIMDLimit(initial_limit=args.capacity))
+        limited = asyncio.run(run(limited_app, rate, args.seconds, tokens))
+        report(f"{multiplier}x load, adaptive limiter (final limit {limited_app.limit.limit:.1f})", limited)
+
+
+if __name__ == "__main__":
+    main()
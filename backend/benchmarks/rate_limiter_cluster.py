@@ -0,0 +1,94 @@
+"""
+Rate limiter throughput against Redis Clusters of increasing size
+
+Run once per cluster size and compare; each --url is the seed node of a
+separate cluster (e.g. 1, 2, 4 and 8 primaries):
+
+    python benchmarks/rate_limiter_cluster.py \\
+        --url redis://10.0.0.1:7000 --url redis://10.0.1.1:7000 \\
+        --url redis://10.0.2.1:7000 --url redis://10.0.3.1:7000 \\
+        --processes 32 --seconds 10
+
+Each process drives RateLimiter.is_allowed (one Lua call per request) and
+get_usage_many (per-node pipelined MGETs) for random users. Load generators
+must not be the bottleneck: add processes or hosts until per-shard
+throughput stops rising for the smallest cluster.
+
+No results have been recorded yet, so per-shard scaling is unverified.
+"""
+
+import argparse
+import multiprocessing
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+USER_COUNT = 100000
+TIERS = ("free", "indie", "pro", "enterprise")
+
+
+def worker(url, mode, seconds, batch_size, seed):
+    os.environ["REDIS_URL"] = url
+    os.environ["REDIS_CLUSTER"] = "true"
+    import rate_limiter
+
+    rng = random.Random(seed)
+    ops = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        if mode == "check":
+            user = rng.randrange(USER_COUNT)
+            rate_limiter.RateLimiter(f"bench-{user}", TIERS[user % 4]).is_allowed()
+            ops += 1
+        else:
+            users = [rng.randrange(USER_COUNT) for _ in range(batch_size)]
+            rate_limiter.get_usage_many((f"bench-{u}", TIERS[u % 4]) for u in users)
+            ops += batch_size
+    return ops
+
+
+def run(url, mode, processes, seconds, batch_size):
+    ctx = multiprocessing.get_context("spawn")
+    with ctx.Pool(processes) as pool:
+        results = pool.starmap(worker, [
+            (url, mode, seconds, batch_size, seed) for seed in range(processes)
+        ])
+    return sum(results) / seconds
+
+
+def shard_count(url):
+    from redis.cluster import RedisCluster
+    client = RedisCluster.from_url(url)
+    try:
+        return len(client.get_primaries())
+    finally:
+        client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", action="append", required=True, help="seed node of one cluster (repeatable)")
+    parser.add_argument("--processes", type=int, default=multiprocessing.cpu_count())
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--batch-size", type=int, default=100, help="users per get_usage_many call")
+    args = parser.parse_args()
+
+    print(f"{'shards':>6} {'mode':>6} {'ops/s':>12} {'ops/s/shard':>12} {'scaling':>8}")
+    baseline = {}
+    for url in args.url:
+        shards = shard_count(url)
+        for mode in ("check", "usage"):
+            throughput = run(url, mode, args.processes, args.seconds, args.batch_size)
+            per_shard = throughput / shards
+            baseline.setdefault(mode, per_shard)
+            print(
+                f"{shards:>6} {mode:>6} {throughput:>12.0f} {per_shard:>12.0f} "
+                f"{per_shard / baseline[mode]:>7.0%}"
+            )
+
+
+if __name__ == "__main__":
+    main()
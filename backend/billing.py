@@ -0,0 +1,242 @@
+"""
+Monthly fee rating
+
+Rates every tenant for one calendar month with calculate_fee and writes an
+invoice line item for each tenant with transactions or API calls. Calls come
+from the monthly_usage counters kept by quota.py:
+
+    python billing.py --period 2026-09 --workers 4
+
+Tenants are split into id ranges (billing_chunks rows) that workers claim
+with SKIP LOCKED. Each range is rated with one aggregate query and one
+vectorized fee computation, and its line items are written in the same
+transaction that marks it done, so a crashed or interrupted run picks up
+where it stopped when started again with the same period. --range re-rates a
+single id range without touching the chunk bookkeeping.
+"""
+
+import argparse
+import logging
+import multiprocessing
+import os
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Tuple
+import numpy as np
+from sqlalchemy import delete, func, insert, or_, select, update
+from sqlalchemy.orm import Session
+import models
+from database import SessionLocal, engine
+from quota import calendar_month
+from stripe_service import PER_CALL_FEE, TRANSACTION_FEE_PERCENT
+
+logger = logging.getLogger(__name__)
+
+# Tenants per chunk; one chunk is rated and committed at a time
+BILLING_CHUNK_SIZE = int(os.getenv("BILLING_CHUNK_SIZE", "10000"))
+
+CHUNK_PENDING = "pending"
+CHUNK_RUNNING = "running"
+CHUNK_DONE = "done"
+
+def rate_fees(transaction_amounts: np.ndarray, api_calls: np.ndarray) -> np.ndarray:
+    """calculate_fee over arrays of per-tenant totals"""
+    transaction_fees = transaction_amounts * TRANSACTION_FEE_PERCENT
+    per_call_fees = api_calls * PER_CALL_FEE
+    return np.minimum(transaction_fees, per_call_fees)
+
+def billing_period(period: str) -> Tuple[datetime, datetime]:
+    """Start and end of a YYYY-MM calendar month (UTC)"""
+    return calendar_month(datetime.strptime(period, "%Y-%m").replace(tzinfo=timezone.utc))
+
+def id_range(column, first_id: Optional[str], end_id: Optional[str]) -> list:
+    conditions = []
+    if first_id is not None:
+        conditions.append(column >= first_id)
+    if end_id is not None:
+        conditions.append(column < end_id)
+    return conditions
+
+def tenant_totals(db: Session, period_start: datetime, period_end: datetime,
+                  first_id: Optional[str], end_id: Optional[str]) -> list:
+    """(user_id, transaction volume, API calls) for active tenants in an id range, in one query"""
+    volumes = select(
+        models.Transaction.user_id,
+        func.sum(models.Transaction.amount).label("volume")
+    ).where(
+        models.Transaction.created_at >= period_start,
+        models.Transaction.created_at < period_end,
+        *id_range(models.Transaction.user_id, first_id, end_id)
+    ).group_by(models.Transaction.user_id).subquery()
+
+    # Quota periods can follow a subscription rather than the calendar month;
+    # each is billed in the month it ends, when its count is final
+    calls = select(
+        models.MonthlyUsage.user_id,
+        func.sum(models.MonthlyUsage.calls).label("calls")
+    ).where(
+        models.MonthlyUsage.period_end > period_start,
+        models.MonthlyUsage.period_end <= period_end,
+        *id_range(models.MonthlyUsage.user_id, first_id, end_id)
+    ).group_by(models.MonthlyUsage.user_id).subquery()
+
+    query = select(
+        models.User.id,
+        func.coalesce(volumes.c.volume, 0.0),
+        func.coalesce(calls.c.calls, 0)
+    ).outerjoin(
+        volumes, volumes.c.user_id == models.User.id
+    ).outerjoin(
+        calls, calls.c.user_id == models.User.id
+    ).where(
+        or_(volumes.c.user_id.isnot(None), calls.c.user_id.isnot(None)),
+        *id_range(models.User.id, first_id, end_id)
+    )
+    return db.execute(query).all()
+
+def rate_range(db: Session, period_start: datetime, period_end: datetime,
+               first_id: Optional[str], end_id: Optional[str]) -> int:
+    """Replace the line items of an id range for one period; the caller commits"""
+    rows = tenant_totals(db, period_start, period_end, first_id, end_id)
+    db.execute(delete(models.InvoiceLineItem).where(
+        models.InvoiceLineItem.period_start == period_start,
+        *id_range(models.InvoiceLineItem.user_id, first_id, end_id)
+    ))
+    if not rows:
+        return 0
+
+    volumes = np.fromiter((row[1] for row in rows), dtype=np.float64, count=len(rows))
+    calls = np.fromiter((row[2] for row in rows), dtype=np.int64, count=len(rows))
+    fees = rate_fees(volumes, calls)
+    db.execute(insert(models.InvoiceLineItem), [
+        {
+            "user_id": row[0],
+            "period_start": period_start,
+            "period_end": period_end,
+            "transaction_volume": volume,
+            "api_calls": call_count,
+            "fee_amount": fee,
+        }
+        for row, volume, call_count, fee in zip(rows, volumes.tolist(), calls.tolist(), fees.tolist())
+    ])
+    return len(rows)
+
+def plan_chunks(db: Session, period_start: datetime, chunk_size: int = BILLING_CHUNK_SIZE) -> int:
+    """Split tenants into id ranges for a period, or resume the ranges of an earlier run
+
+    Chunks left running by a run that died are handed out again, so only one
+    run per period may be active at a time.
+    """
+    existing = db.query(func.count(models.BillingChunk.id)).filter(
+        models.BillingChunk.period_start == period_start
+    ).scalar()
+    if existing:
+        db.execute(update(models.BillingChunk).where(
+            models.BillingChunk.period_start == period_start,
+            models.BillingChunk.status == CHUNK_RUNNING
+        ).values(status=CHUNK_PENDING))
+        db.commit()
+        return existing
+
+    # Every chunk_size-th id starts a chunk; the first and last chunks are open-ended
+    # so tenants created during the run still fall into some range
+    numbered = select(
+        models.User.id,
+        func.row_number().over(order_by=models.User.id).label("position")
+    ).subquery()
+    boundaries = db.execute(
+        select(numbered.c.id).where(
+            numbered.c.position % chunk_size == 1 % chunk_size,
+            numbered.c.position > 1
+        ).order_by(numbered.c.id)
+    ).scalars().all()
+
+    bounds: List[Optional[str]] = [None, *boundaries, None]
+    db.execute(insert(models.BillingChunk), [
+        {"period_start": period_start, "first_user_id": first, "end_user_id": end, "status": CHUNK_PENDING}
+        for first, end in zip(bounds, bounds[1:])
+    ])
+    db.commit()
+    return len(bounds) - 1
+
+def claim_chunk(db: Session, period_start: datetime) -> Optional[models.BillingChunk]:
+    """Mark one pending chunk of the period as running and return it"""
+    while True:
+        chunk = db.query(models.BillingChunk).filter(
+            models.BillingChunk.period_start == period_start,
+            models.BillingChunk.status == CHUNK_PENDING
+        ).with_for_update(skip_locked=True).first()
+        if chunk is None:
+            db.rollback()
+            return None
+        # Guarded so that two workers cannot both claim a chunk where SKIP LOCKED is unsupported
+        claimed = db.execute(update(models.BillingChunk).where(
+            models.BillingChunk.id == chunk.id,
+            models.BillingChunk.status == CHUNK_PENDING
+        ).values(status=CHUNK_RUNNING)).rowcount
+        db.commit()
+        if claimed:
+            return chunk
+
+def run_worker(period: str) -> int:
+    """Rate chunks of a period until none are pending; returns the line items written"""
+    # Connections inherited from the parent process must not be reused
+    engine.dispose(close=False)
+    period_start, period_end = billing_period(period)
+    written = 0
+    db = SessionLocal()
+    try:
+        while True:
+            chunk = claim_chunk(db, period_start)
+            if chunk is None:
+                return written
+            count = rate_range(db, period_start, period_end, chunk.first_user_id, chunk.end_user_id)
+            chunk.status = CHUNK_DONE
+            chunk.line_items = count
+            db.commit()
+            written += count
+    finally:
+        db.close()
+
+def run_billing(period: str, workers: int = 1, chunk_size: int = BILLING_CHUNK_SIZE) -> int:
+    """Rate every tenant for a period, resuming an earlier run of it; returns the line items written"""
+    period_start, _ = billing_period(period)
+    db = SessionLocal()
+    try:
+        chunks = plan_chunks(db, period_start, chunk_size)
+    finally:
+        db.close()
+    logger.info("Billing %s: %d chunks, %d workers", period, chunks, workers)
+
+    if workers <= 1:
+        return run_worker(period)
+    with multiprocessing.Pool(workers) as pool:
+        return sum(pool.map(run_worker, [period] * workers))
+
+def previous_period() -> str:
+    return (datetime.now(timezone.utc).replace(day=1) - timedelta(days=1)).strftime("%Y-%m")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--period", default=previous_period(), help="YYYY-MM to rate (default: last month)")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--chunk-size", type=int, default=BILLING_CHUNK_SIZE)
+    parser.add_argument("--range", nargs=2, metavar=("FIRST_ID", "END_ID"),
+                        help="re-rate tenants with FIRST_ID <= id < END_ID only ('-' leaves a bound open)")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    if args.range:
+        first_id, end_id = (None if bound == "-" else bound for bound in args.range)
+        period_start, period_end = billing_period(args.period)
+        db = SessionLocal()
+        try:
+            written = rate_range(db, period_start, period_end, first_id, end_id)
+            db.commit()
+        finally:
+            db.close()
+    else:
+        written = run_billing(args.period, args.workers, args.chunk_size)
+    logger.info("Billing %s: wrote %d line items", args.period, written)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+import os
+import threading
+import time
+import uuid
+
+_lock = threading.Lock()
+_last_ms = 0
+_counter = 0
+
+def uuid7() -> uuid.UUID:
+    """Time-ordered UUID (RFC 9562 version 7)
+
+    48 bits of Unix milliseconds, a 12-bit counter that keeps IDs from one
+    process increasing within a millisecond, then 62 random bits. New rows
+    land at the right edge of the primary key index instead of a random leaf.
+    """
+    global _last_ms, _counter
+    with _lock:
+        ms = time.time_ns() // 1_000_000
+        if ms > _last_ms:
+            # Random start within the lower half leaves room to count up
+            _last_ms, _counter = ms, int.from_bytes(os.urandom(2), "big") & 0x7FF
+        else:
+            # Same millisecond, or the clock stepped back: keep counting from the last ID
+            _counter += 1
+            if _counter > 0xFFF:
+                _last_ms, _counter = _last_ms + 1, 0
+        ms, counter = _last_ms, _counter
+
+    rand_b = int.from_bytes(os.urandom(8), "big") & ((1 << 62) - 1)
+    return uuid.UUID(int=(ms << 80) | (0x7 << 76) | (counter << 64) | (0b10 << 62) | rand_b)
+
+def new_id() -> str:
+    """Primary key default for new rows"""
+    return str(uuid7())
+
+def is_uuid(value: str) -> bool:
+    """True if value parses as a UUID, so it can be compared against a uuid column"""
+    try:
+        uuid.UUID(value)
+    except (TypeError, ValueError):
+        return False
+    return True
@@ -0,0 +1,217 @@
+import hashlib
+import logging
+import math
+import os
+import threading
+import time
+import uuid
+from typing import List, Optional
+import metrics
+import models
+from database import SessionLocal
+from rate_limiter import REDIS_CLUSTER, REDIS_ERRORS, REDIS_RETRY_INTERVAL, get_redis_client
+
+logger = logging.getLogger(__name__)
+
+KEY_FILTER_FALSE_POSITIVE_RATE = float(os.getenv("KEY_FILTER_FALSE_POSITIVE_RATE", "0.001"))
+# Periodic rebuilds drop revoked keys and resize the filter as the table grows
+KEY_FILTER_REBUILD_INTERVAL = float(os.getenv("KEY_FILTER_REBUILD_INTERVAL", "300"))
+# How long key creation waits for the other workers to add a new key to their filters
+KEY_FILTER_SYNC_TIMEOUT_MS = float(os.getenv("KEY_FILTER_SYNC_TIMEOUT_MS", "100"))
+KEY_FILTER_CHANNEL = "api_key_filter:added"
+KEY_FILTER_MIN_CAPACITY = 10000
+
+metrics.describe("swiftapi_api_key_filter_ready", "gauge", "1 while the API key filter is built and in sync")
+metrics.describe("swiftapi_api_key_filter_keys", "gauge", "Keys added to the API key filter")
+metrics.describe("swiftapi_api_key_filter_rejections_total", "counter", "API keys rejected by the filter without a query")
+
+def key_digest(api_key: str) -> bytes:
+    """16-byte digest of a key; only digests are kept in memory and sent between workers"""
+    return hashlib.blake2b(api_key.encode(), digest_size=16).digest()
+
+class BloomFilter:
+    """Fixed-size Bloom filter over key digests"""
+
+    def __init__(self, capacity: int, false_positive_rate: float):
+        self.capacity = capacity
+        self.size = max(8, math.ceil(-capacity * math.log(false_positive_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, digest: bytes):
+        # Double hashing; the digest is already uniformly distributed
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, digest: bytes):
+        for position in self._positions(digest):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, digest: bytes) -> bool:
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(digest))
+
+class APIKeyFilter:
+    """Negative-lookup filter of active API keys, kept in sync across workers
+
+    A miss means the key was never issued, so it can be rejected without a
+    query. Hits still go to the database, including revoked keys, which stay in
+    the filter until the next rebuild. Until the filter is built and subscribed
+    to keys created by other workers, every key is let through.
+
+    On Redis Cluster the channel is sharded (SPUBLISH/SSUBSCRIBE): a plain
+    PUBLISH only counts the subscribers on the node it was sent to, which
+    would end the wait for acks before every worker has the key.
+    """
+
+    def __init__(self):
+        self._filter: Optional[BloomFilter] = None
+        self._pending: Optional[List[bytes]] = None
+        self._lock = threading.Lock()
+        # Periodic rebuilds run beside the subscriber; only one builds at a time
+        self._rebuild_lock = threading.Lock()
+        self._rebuild_thread: Optional[threading.Thread] = None
+        self._thread: Optional[threading.Thread] = None
+        self.ready = False
+
+    def might_contain(self, api_key: str) -> bool:
+        bloom = self._filter
+        if not self.ready or bloom is None:
+            return True
+        if key_digest(api_key) in bloom:
+            return True
+        metrics.inc("swiftapi_api_key_filter_rejections_total")
+        return False
+
+    def add(self, api_key: str):
+        """Add a newly created key and wait until the other workers have it too"""
+        digest = key_digest(api_key)
+        self._add_digest(digest)
+
+        message_id = uuid.uuid4().hex
+        ack_key = f"api_key_filter:acks:{message_id}"
+        try:
+            client = get_redis_client()
+            publish = client.spublish if REDIS_CLUSTER else client.publish
+            receivers = publish(KEY_FILTER_CHANNEL, f"{message_id}:{digest.hex()}")
+            deadline = time.monotonic() + KEY_FILTER_SYNC_TIMEOUT_MS / 1000
+            while int(client.get(ack_key) or 0) < receivers and time.monotonic() < deadline:
+                time.sleep(0.002)
+        except REDIS_ERRORS:
+            # Subscribers that lost Redis stop trusting their filters until they rebuild
+            logger.warning("Could not publish new API key to the other workers' filters")
+
+    def _add_digest(self, digest: bytes):
+        with self._lock:
+            if self._filter is not None:
+                self._filter.add(digest)
+            if self._pending is not None:
+                self._pending.append(digest)
+
+    def _on_message(self, data):
+        if isinstance(data, bytes):
+            data = data.decode()
+        message_id, _, digest_hex = data.partition(":")
+        self._add_digest(bytes.fromhex(digest_hex))
+        ack_key = f"api_key_filter:acks:{message_id}"
+        pipe = get_redis_client().pipeline(transaction=False)
+        pipe.incr(ack_key)
+        pipe.expire(ack_key, 60)
+        pipe.execute()
+
+    def rebuild(self):
+        """Build a fresh filter from the api_keys table"""
+        with self._rebuild_lock:
+            # Keys published while the table is read are replayed into the new filter
+            with self._lock:
+                self._pending = []
+            try:
+                db = SessionLocal()
+                try:
+                    digests = [
+                        key_digest(key)
+                        for (key,) in db.query(models.APIKey.key).filter(models.APIKey.is_active == True).yield_per(10000)
+                    ]
+                finally:
+                    db.close()
+            except Exception:
+                with self._lock:
+                    self._pending = None
+                raise
+
+            bloom = BloomFilter(max(KEY_FILTER_MIN_CAPACITY, 2 * len(digests)), KEY_FILTER_FALSE_POSITIVE_RATE)
+            for digest in digests:
+                bloom.add(digest)
+            with self._lock:
+                for digest in self._pending:
+                    bloom.add(digest)
+                self._pending = None
+                self._filter = bloom
+        metrics.set_gauge("swiftapi_api_key_filter_keys", bloom.count)
+
+    def _rebuild_in_background(self):
+        try:
+            self.rebuild()
+        except Exception:
+            logger.exception("API key filter rebuild failed; keeping the current filter")
+
+    def _start_rebuild(self):
+        """Rebuild on another thread so this one keeps adding and acking keys from other workers meanwhile"""
+        if self._rebuild_thread is None or not self._rebuild_thread.is_alive():
+            self._rebuild_thread = threading.Thread(
+                target=self._rebuild_in_background, name="api-key-filter-rebuild", daemon=True
+            )
+            self._rebuild_thread.start()
+
+    def _set_ready(self, ready: bool):
+        self.ready = ready
+        metrics.set_gauge("swiftapi_api_key_filter_ready", 1 if ready else 0)
+
+    def _run(self):
+        while True:
+            pubsub = None
+            try:
+                pubsub = get_redis_client().pubsub()
+                if REDIS_CLUSTER:
+                    pubsub.ssubscribe(KEY_FILTER_CHANNEL)
+                    get_message, subscribed, published = pubsub.get_sharded_message, "ssubscribe", "smessage"
+                else:
+                    pubsub.subscribe(KEY_FILTER_CHANNEL)
+                    get_message, subscribed, published = pubsub.get_message, "subscribe", "message"
+                # Keys committed before the subscription is confirmed are in the table read below
+                while True:
+                    message = get_message(timeout=1.0)
+                    if message and message["type"] == subscribed:
+                        break
+                self.rebuild()
+                self._set_ready(True)
+                next_rebuild = time.monotonic() + KEY_FILTER_REBUILD_INTERVAL
+
+                while True:
+                    message = get_message(timeout=1.0)
+                    if message and message["type"] == published:
+                        self._on_message(message["data"])
+                    if time.monotonic() >= next_rebuild or self._filter.count > self._filter.capacity:
+                        self._start_rebuild()
+                        next_rebuild = time.monotonic() + KEY_FILTER_REBUILD_INTERVAL
+            except REDIS_ERRORS:
+                logger.warning("API key filter lost its Redis subscription; checking keys against the database")
+            except Exception:
+                logger.exception("API key filter failed; checking keys against the database")
+            finally:
+                self._set_ready(False)
+                if pubsub is not None:
+                    try:
+                        pubsub.close()
+                    except REDIS_ERRORS:
+                        pass
+            time.sleep(REDIS_RETRY_INTERVAL)
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="api-key-filter", daemon=True)
+            self._thread.start()
+
+api_key_filter = APIKeyFilter()
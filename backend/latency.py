@@ -0,0 +1,186 @@
+import logging
+import math
+import os
+import threading
+import time
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, Optional, Tuple
+from fastapi import Request
+import metrics
+from rate_limiter import REDIS_ERRORS, get_redis_client, redis_health
+
+logger = logging.getLogger(__name__)
+
+# Reported percentiles are within this fraction of the true value
+LATENCY_RELATIVE_ACCURACY = float(os.getenv("LATENCY_RELATIVE_ACCURACY", "0.01"))
+# Seconds between flushes of in-memory sketches to Redis
+LATENCY_FLUSH_INTERVAL = float(os.getenv("LATENCY_FLUSH_INTERVAL", "10"))
+# Hourly buckets summarised by /usage
+LATENCY_WINDOW_HOURS = int(os.getenv("LATENCY_WINDOW_HOURS", "24"))
+# Faster responses are counted in the lowest bucket
+LATENCY_MIN_MS = 0.01
+PERCENTILES = (50, 95, 99)
+
+_gamma = (1 + LATENCY_RELATIVE_ACCURACY) / (1 - LATENCY_RELATIVE_ACCURACY)
+_log_gamma = math.log(_gamma)
+
+metrics.describe("swiftapi_latency_flush_failures_total", "counter", "Latency sketch flushes that could not reach Redis")
+
+def bucket_index(ms: float) -> int:
+    """Logarithmic bucket holding a response time; bucket i covers (gamma^(i-1), gamma^i] ms"""
+    return math.ceil(math.log(max(ms, LATENCY_MIN_MS)) / _log_gamma)
+
+def bucket_value(index: int) -> float:
+    """Representative response time of a bucket, within LATENCY_RELATIVE_ACCURACY of any value in it"""
+    return 2 * _gamma ** index / (_gamma + 1)
+
+def quantiles(buckets: Dict[int, int], percentiles: Iterable[int] = PERCENTILES) -> Dict[str, Optional[float]]:
+    """Percentiles of a sketch given as {bucket index: count}"""
+    total = sum(buckets.values())
+    result: Dict[str, Optional[float]] = {}
+    ordered = sorted(buckets.items())
+    for percentile in percentiles:
+        if not total:
+            result[f"p{percentile}_ms"] = None
+            continue
+        rank = percentile / 100 * (total - 1)
+        seen = 0
+        for index, count in ordered:
+            seen += count
+            if seen > rank:
+                break
+        result[f"p{percentile}_ms"] = round(bucket_value(index), 2)
+    return result
+
+def current_hour() -> int:
+    return int(time.time() // 3600)
+
+def latency_key(user_id: str, hour: int) -> str:
+    return f"latency:{{{user_id}}}:{hour}"
+
+def tag_request(request: Request, user_id: str):
+    """Attribute the request's response time to a user and its route template"""
+    route = request.scope.get("route")
+    if route is None:
+        endpoint = request.scope.get("endpoint")
+        route = next((r for r in request.app.router.routes if getattr(r, "endpoint", None) is endpoint), None)
+    request.state.latency_owner = (user_id, route.path if route is not None else request.url.path)
+
+class LatencyRecorder:
+    """Per-user, per-route response time sketches, merged into hourly Redis hashes
+
+    A sketch is a count per logarithmic bucket, so merging two sketches adds
+    their counts. Each flush applies this worker's counts with HINCRBY,
+    which needs no coordination between workers.
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        # (user_id, hour) -> {"route|bucket": count}
+        self._pending: Dict[Tuple[str, int], Counter] = defaultdict(Counter)
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def record(self, user_id: str, route: str, ms: float):
+        with self._lock:
+            self._pending[(user_id, current_hour())][f"{route}|{bucket_index(ms)}"] += 1
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, defaultdict(Counter)
+        if not pending:
+            return
+
+        ttl = (LATENCY_WINDOW_HOURS + 1) * 3600
+        try:
+            pipe = get_redis_client().pipeline(transaction=False)
+            for (user_id, hour), counts in pending.items():
+                key = latency_key(user_id, hour)
+                for field, count in counts.items():
+                    pipe.hincrby(key, field, count)
+                pipe.expire(key, ttl)
+            pipe.execute()
+            redis_health.record_success()
+        except REDIS_ERRORS:
+            redis_health.record_failure()
+            metrics.inc("swiftapi_latency_flush_failures_total")
+            # Try again on the next tick; hours that have left the window are dropped
+            oldest = current_hour() - LATENCY_WINDOW_HOURS
+            with self._lock:
+                for (user_id, hour), counts in pending.items():
+                    if hour > oldest:
+                        self._pending[(user_id, hour)].update(counts)
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Failed to flush latency sketches")
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="latency-recorder", daemon=True)
+            self._thread.start()
+
+latency_recorder = LatencyRecorder(LATENCY_FLUSH_INTERVAL)
+
+def latency_summary(user_id: str) -> Optional[dict]:
+    """Response time percentiles over the last LATENCY_WINDOW_HOURS, overall and per route
+
+    Reads one hash per hour, so the cost depends on the number of routes and
+    buckets, not on the number of calls. None while Redis is unavailable.
+    """
+    if not redis_health.available():
+        return None
+    hour = current_hour()
+    try:
+        pipe = get_redis_client().pipeline(transaction=False)
+        for offset in range(LATENCY_WINDOW_HOURS):
+            pipe.hgetall(latency_key(user_id, hour - offset))
+        hashes = pipe.execute()
+        redis_health.record_success()
+    except REDIS_ERRORS:
+        redis_health.record_failure()
+        return None
+
+    overall: Counter = Counter()
+    routes: Dict[str, Counter] = defaultdict(Counter)
+    for fields in hashes:
+        for field, count in fields.items():
+            route, index = field.rsplit("|", 1)
+            overall[int(index)] += int(count)
+            routes[route][int(index)] += int(count)
+
+    return {
+        "window_hours": LATENCY_WINDOW_HOURS,
+        "count": sum(overall.values()),
+        **quantiles(overall),
+        "routes": {
+            route: {"count": sum(buckets.values()), **quantiles(buckets)}
+            for route, buckets in sorted(routes.items())
+        }
+    }
+
+class LatencyMiddleware:
+    """ASGI middleware timing requests tagged by tag_request, up to the last response body chunk"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+
+        async def send_and_time(message):
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                owner = scope.get("state", {}).get("latency_owner")
+                if owner:
+                    latency_recorder.record(*owner, (time.perf_counter() - start) * 1000)
+
+        await self.app(scope, receive, send_and_time)
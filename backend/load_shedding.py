@@ -0,0 +1,212 @@
+import json
+import os
+import time
+from enum import IntEnum
+from typing import Dict, Optional
+from fastapi import HTTPException
+import auth
+import metrics
+from ids import is_uuid
+from token_cache import api_key_tiers
+
+# The limit is cut when responses take this many times their route's baseline latency
+LATENCY_TOLERANCE = float(os.getenv("CONCURRENCY_LATENCY_TOLERANCE", "2.0"))
+# Samples are judged per window, and the limit is cut at most once per window
+WINDOW_SECONDS = float(os.getenv("CONCURRENCY_WINDOW_MS", "1000")) / 1000
+MIN_WINDOW_SAMPLES = int(os.getenv("CONCURRENCY_MIN_WINDOW_SAMPLES", "10"))
+INITIAL_CONCURRENCY_LIMIT = int(os.getenv("INITIAL_CONCURRENCY_LIMIT", "20"))
+MIN_CONCURRENCY_LIMIT = int(os.getenv("MIN_CONCURRENCY_LIMIT", "4"))
+MAX_CONCURRENCY_LIMIT = int(os.getenv("MAX_CONCURRENCY_LIMIT", "200"))
+SHED_RETRY_AFTER_SECONDS = 1
+# Baselines below this are treated as this, so jitter on very fast routes is not read as a slowdown
+BASELINE_FLOOR_SECONDS = 0.005
+# Bounds memory when clients probe many unknown paths
+MAX_TRACKED_ROUTES = 100
+
+# Never shed probes and scrapes
+EXEMPT_PATHS = {"/health", "/metrics"}
+# Tier of an API key whose owner is not cached yet: neither promoted nor demoted
+UNRESOLVED_TIER = "unresolved"
+
+# Slow by design (bcrypt, Stripe calls), so their latency says nothing about load
+UNSIGNALLED_ROUTES = {
+    "POST /auth/signup",
+    "POST /auth/login",
+    "POST /subscriptions",
+    "POST /payments",
+}
+
+class Priority(IntEnum):
+    CRITICAL = 0
+    NORMAL = 1
+    LOW = 2
+
+# Share of the concurrency limit each priority may occupy. Lower classes are
+# shed first, leaving headroom for payments and enterprise traffic.
+PRIORITY_SHARE = {
+    Priority.CRITICAL: 1.0,
+    Priority.NORMAL: 0.8,
+    Priority.LOW: 0.5,
+}
+
+metrics.describe("swiftapi_concurrency_limit", "gauge", "Current adaptive concurrency limit")
+metrics.describe("swiftapi_requests_in_flight", "gauge", "Requests currently admitted")
+metrics.describe("swiftapi_requests_shed_total", "counter", "Requests rejected with 503 by load shedding")
+
+def route_key(method: str, path: str) -> str:
+    """Method and path with ID segments collapsed, as in DELETE /api-keys/{id}"""
+    segments = ["{id}" if is_uuid(segment) else segment for segment in path.split("/")]
+    return f"{method} {'/'.join(segments)}"
+
+class AIMDLimit:
+    """Additive-increase / multiplicative-decrease concurrency limit driven by latency
+
+    Each route is compared with its own baseline, the fastest response seen
+    recently, so a mix of fast and slow routes does not read as overload.
+    The limit is cut at most once per window, when the window's average
+    latency ratio exceeds the tolerance.
+    """
+
+    def __init__(
+        self,
+        initial_limit: int = INITIAL_CONCURRENCY_LIMIT,
+        min_limit: int = MIN_CONCURRENCY_LIMIT,
+        max_limit: int = MAX_CONCURRENCY_LIMIT,
+        tolerance: float = LATENCY_TOLERANCE,
+        window: float = WINDOW_SECONDS,
+        min_window_samples: int = MIN_WINDOW_SAMPLES,
+        backoff_ratio: float = 0.9,
+        baseline_drift: float = 0.02
+    ):
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.tolerance = tolerance
+        self.window = window
+        self.min_window_samples = min_window_samples
+        self.backoff_ratio = backoff_ratio
+        self.baseline_drift = baseline_drift
+        self.baselines: Dict[str, float] = {}
+        self._window_start = time.monotonic()
+        self._window_minimums: Dict[str, float] = {}
+        self._ratio_sum = 0.0
+        self._samples = 0
+
+    def on_sample(self, route: str, latency: float, in_flight: int, now: Optional[float] = None):
+        if route in UNSIGNALLED_ROUTES:
+            return
+        baseline = self.baselines.get(route)
+        if baseline is None:
+            if len(self.baselines) >= MAX_TRACKED_ROUTES:
+                return
+            baseline = latency
+        self.baselines[route] = baseline = min(baseline, latency)
+        self._window_minimums[route] = min(self._window_minimums.get(route, latency), latency)
+
+        ratio = latency / max(baseline, BASELINE_FLOOR_SECONDS)
+        self._ratio_sum += ratio
+        self._samples += 1
+        if ratio <= self.tolerance and in_flight * 2 >= self.limit:
+            # Only grow while the limit is actually being used
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+
+        now = time.monotonic() if now is None else now
+        if now - self._window_start >= self.window and self._samples >= self.min_window_samples:
+            self._close_window(now)
+
+    def _close_window(self, now: float):
+        if self._ratio_sum / self._samples > self.tolerance:
+            self.limit = max(self.min_limit, self.limit * self.backoff_ratio)
+        # Baselines creep up towards what each route served this window, so a
+        # route that became slower for good is relearned instead of read as overload
+        for route, fastest in self._window_minimums.items():
+            self.baselines[route] = min(self.baselines[route] * (1 + self.baseline_drift), fastest)
+        self._window_start = now
+        self._window_minimums = {}
+        self._ratio_sum = 0.0
+        self._samples = 0
+
+def token_tier(authorization: Optional[str]) -> Optional[str]:
+    """Tier claim of a valid bearer JWT, or None"""
+    if not authorization or not authorization.lower().startswith("bearer "):
+        return None
+    try:
+        # Runs on the event loop, so no Redis revocation lookup here; get_current_user does that
+        return auth.verify_token(authorization[7:], check_revocation=False).get("tier")
+    except HTTPException:
+        return None
+
+def request_priority(method: str, path: str, authorization: Optional[str]) -> Priority:
+    """Priority of a request from its bearer JWT or the cached tier of its API key
+
+    Never queries the database: this runs before the shed decision, when the
+    threadpool and connection pool may be the very things overloaded.
+    """
+    if authorization and authorization.lower().startswith("bearer ") and \
+            authorization[7:].startswith(auth.API_KEY_PREFIX):
+        owner = api_key_tiers.get(authorization[7:])
+        # Key not yet seen on this worker; verify_api_key caches its tier once admitted
+        return classify(method, path, owner["tier"] if owner is not None else UNRESOLVED_TIER)
+    return classify(method, path, token_tier(authorization))
+
+def classify(method: str, path: str, tier: Optional[str]) -> Priority:
+    if method == "POST" and path == "/payments":
+        return Priority.CRITICAL
+    if tier == "enterprise":
+        return Priority.CRITICAL
+    if path == "/usage" and tier in (None, "free"):
+        return Priority.LOW
+    return Priority.NORMAL
+
+class AdaptiveConcurrencyMiddleware:
+    """ASGI middleware that admits requests up to an adaptive limit and sheds the rest
+
+    Rejected requests get an immediate 503 with Retry-After instead of
+    queueing behind the server and timing out.
+    """
+
+    def __init__(self, app, limit: Optional[AIMDLimit] = None):
+        self.app = app
+        self.limit = limit or AIMDLimit()
+        self.in_flight = 0
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in EXEMPT_PATHS:
+            await self.app(scope, receive, send)
+            return
+
+        authorization = None
+        for name, value in scope["headers"]:
+            if name == b"authorization":
+                authorization = value.decode("latin-1")
+                break
+        priority = request_priority(scope["method"], scope["path"], authorization)
+
+        if self.in_flight >= self.limit.limit * PRIORITY_SHARE[priority]:
+            metrics.inc("swiftapi_requests_shed_total", priority=priority.name.lower())
+            await self._shed(send)
+            return
+
+        self.in_flight += 1
+        metrics.set_gauge("swiftapi_requests_in_flight", self.in_flight)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.limit.on_sample(route_key(scope["method"], scope["path"]), time.perf_counter() - start, self.in_flight)
+            self.in_flight -= 1
+            metrics.set_gauge("swiftapi_requests_in_flight", self.in_flight)
+            metrics.set_gauge("swiftapi_concurrency_limit", round(self.limit.limit, 2))
+
+    async def _shed(self, send):
+        body = json.dumps({"detail": "Server is overloaded, retry later"}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 503,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(SHED_RETRY_AFTER_SECONDS).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
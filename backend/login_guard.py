@@ -0,0 +1,147 @@
+import hashlib
+import math
+import os
+import time
+from typing import Tuple
+from fastapi import HTTPException, Request
+import metrics
+from rate_limiter import REDIS_ERRORS, LocalWindowStore, fair_share, get_redis_client, redis_health
+
+# Login attempts allowed per client IP in a sliding window
+LOGIN_IP_LIMIT = int(os.getenv("LOGIN_IP_LIMIT", "20"))
+LOGIN_IP_WINDOW = int(os.getenv("LOGIN_IP_WINDOW", "60"))
+# Failed logins allowed per email in a sliding window
+LOGIN_EMAIL_FAILURE_LIMIT = int(os.getenv("LOGIN_EMAIL_FAILURE_LIMIT", "10"))
+LOGIN_EMAIL_WINDOW = int(os.getenv("LOGIN_EMAIL_WINDOW", "900"))
+# Failures before each further attempt on an email has to wait, doubling from the base delay
+LOGIN_FREE_FAILURES = int(os.getenv("LOGIN_FREE_FAILURES", "3"))
+LOGIN_DELAY_BASE = float(os.getenv("LOGIN_DELAY_BASE", "1"))
+LOGIN_DELAY_MAX = float(os.getenv("LOGIN_DELAY_MAX", "60"))
+# Proxies in front of the app that append to X-Forwarded-For (1 on Railway, 0 when clients connect directly)
+TRUSTED_PROXY_HOPS = int(os.getenv("TRUSTED_PROXY_HOPS", "0"))
+
+metrics.describe("swiftapi_login_rejections_total", "counter", "Login attempts rejected before any database or bcrypt work")
+
+# Used while Redis is unavailable: per-IP and per-email windows, without delays
+local_login_store = LocalWindowStore()
+
+def client_ip(request: Request) -> str:
+    """Address of the client as seen by the outermost trusted proxy
+
+    Entries left of the ones our proxies appended are supplied by the client
+    and can be forged, so the address is counted from the right.
+    """
+    peer = request.client.host if request.client else "unknown"
+    if TRUSTED_PROXY_HOPS <= 0:
+        return peer
+    forwarded = [hop.strip() for value in request.headers.getlist("x-forwarded-for") for hop in value.split(",")]
+    forwarded = [hop for hop in forwarded if hop]
+    if len(forwarded) < TRUSTED_PROXY_HOPS:
+        return peer
+    return forwarded[-TRUSTED_PROXY_HOPS]
+
+def email_digest(email: str) -> str:
+    """Keys carry a digest rather than the address itself"""
+    return hashlib.blake2b(email.strip().lower().encode(), digest_size=12).hexdigest()
+
+def window_keys(name: str, window: int, now: float) -> Tuple[str, str]:
+    """Current and previous fixed-window buckets for a sliding window counter"""
+    bucket = int(now // window)
+    return f"login:{{{name}}}:{bucket}", f"login:{{{name}}}:{bucket - 1}"
+
+def sliding_count(current: int, previous: int, window: int, now: float) -> float:
+    """Weight the previous bucket by how much of it still overlaps the window"""
+    return previous * (1 - (now % window) / window) + current
+
+def failure_delay(failures: float) -> float:
+    if failures <= LOGIN_FREE_FAILURES:
+        return 0.0
+    return min(LOGIN_DELAY_MAX, LOGIN_DELAY_BASE * 2 ** (failures - LOGIN_FREE_FAILURES - 1))
+
+def reject(reason: str, retry_after: float):
+    metrics.inc("swiftapi_login_rejections_total", reason=reason)
+    raise HTTPException(
+        status_code=429,
+        detail="Too many login attempts",
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))}
+    )
+
+def check_login_attempt(client_ip: str, email: str):
+    """Count a login attempt and reject it if the IP or email is over its limits
+
+    Costs one pipelined Redis round trip and runs before the user lookup and
+    bcrypt, so floods are turned away cheaply.
+    """
+    now = time.time()
+    email_name = f"email:{email_digest(email)}"
+    ip_current, ip_previous = window_keys(f"ip:{client_ip}", LOGIN_IP_WINDOW, now)
+    email_current, email_previous = window_keys(email_name, LOGIN_EMAIL_WINDOW, now)
+
+    if redis_health.available():
+        try:
+            pipe = get_redis_client().pipeline(transaction=False)
+            pipe.incr(ip_current)
+            pipe.expire(ip_current, 2 * LOGIN_IP_WINDOW)
+            pipe.get(ip_previous)
+            pipe.get(email_current)
+            pipe.get(email_previous)
+            pipe.pttl(f"login:{{{email_name}}}:delay")
+            ip_count, _, ip_previous_count, failures, previous_failures, delay_ms = pipe.execute()
+            redis_health.record_success()
+        except REDIS_ERRORS:
+            redis_health.record_failure()
+        else:
+            window_left = LOGIN_IP_WINDOW - now % LOGIN_IP_WINDOW
+            if sliding_count(ip_count, int(ip_previous_count or 0), LOGIN_IP_WINDOW, now) > LOGIN_IP_LIMIT:
+                reject("ip", window_left)
+            failures = sliding_count(int(failures or 0), int(previous_failures or 0), LOGIN_EMAIL_WINDOW, now)
+            if failures >= LOGIN_EMAIL_FAILURE_LIMIT:
+                reject("email", LOGIN_EMAIL_WINDOW - now % LOGIN_EMAIL_WINDOW)
+            if delay_ms > 0:
+                reject("delay", delay_ms / 1000)
+            return
+
+    retry_after, _ = local_login_store.check_and_increment([(f"login:ip:{client_ip}", LOGIN_IP_LIMIT, LOGIN_IP_WINDOW)])
+    if retry_after is not None:
+        reject("ip", retry_after)
+    failures, window_left = local_login_store.peek(f"login:{email_name}")
+    if failures >= fair_share(LOGIN_EMAIL_FAILURE_LIMIT):
+        reject("email", window_left)
+
+def record_login_failure(email: str):
+    """Count a failed login and make the next attempt on this email wait"""
+    now = time.time()
+    email_name = f"email:{email_digest(email)}"
+    email_current, email_previous = window_keys(email_name, LOGIN_EMAIL_WINDOW, now)
+
+    if redis_health.available():
+        try:
+            client = get_redis_client()
+            pipe = client.pipeline(transaction=False)
+            pipe.incr(email_current)
+            pipe.expire(email_current, 2 * LOGIN_EMAIL_WINDOW)
+            pipe.get(email_previous)
+            failures, _, previous_failures = pipe.execute()
+            delay = failure_delay(sliding_count(failures, int(previous_failures or 0), LOGIN_EMAIL_WINDOW, now))
+            if delay:
+                client.set(f"login:{{{email_name}}}:delay", 1, px=int(delay * 1000))
+            redis_health.record_success()
+            return
+        except REDIS_ERRORS:
+            redis_health.record_failure()
+
+    local_login_store.check_and_increment([(f"login:{email_name}", float('inf'), LOGIN_EMAIL_WINDOW)])
+
+def record_login_success(email: str):
+    """Clear an email's failures after a successful login"""
+    email_name = f"email:{email_digest(email)}"
+    now = time.time()
+    if redis_health.available():
+        try:
+            get_redis_client().delete(
+                *window_keys(email_name, LOGIN_EMAIL_WINDOW, now),
+                f"login:{{{email_name}}}:delay"
+            )
+            redis_health.record_success()
+        except REDIS_ERRORS:
+            redis_health.record_failure()
@@ -1,16 +1,29 @@
 from fastapi import FastAPI, Depends, HTTPException, status, Header, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
+from fastapi.encoders import jsonable_encoder
 from sqlalchemy.orm import Session
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import List, Optional
+import re
 import secrets
 import models
 import auth
 from database import get_db, engine
-from rate_limiter import RateLimiter
+from rate_limiter import RateLimiter, redis_health
+import metrics
+from load_shedding import AdaptiveConcurrencyMiddleware
+from latency import LatencyMiddleware, latency_recorder, latency_summary
+from quota import (
+    LimitHeadersMiddleware, enforce_limits, limit_usage_reads, quota_persister, quota_usage, reserve_extra_calls
+)
 import stripe_service
-from pydantic import BaseModel, EmailStr
+from etag import conditional_json_response
+from ids import is_uuid
+from singleflight import read_coalescer
+from key_filter import api_key_filter
+from login_guard import check_login_attempt, client_ip, record_login_failure, record_login_success
+from pydantic import BaseModel, EmailStr, Field, ValidationError
 
 models.Base.metadata.create_all(bind=engine)
 
@@ -20,6 +33,12 @@ app = FastAPI(
     version="1.0.0"
 )
 
+# Middleware added last runs first: CORS -> latency -> load shedding -> limit headers -> routes
+app.add_middleware(LimitHeadersMiddleware)
+app.add_middleware(AdaptiveConcurrencyMiddleware)
+# Outside load shedding so that time spent queued counts towards a tenant's latency
+app.add_middleware(LatencyMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -28,6 +47,22 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.on_event("startup")
+def start_background_jobs():
+    quota_persister.start()
+    latency_recorder.start()
+    api_key_filter.start()
+
+@app.on_event("startup")
+def warm_up_password_hashing():
+    # The first dummy verify also hashes the dummy password; keep that off the login path
+    auth.pwd_context.dummy_verify()
+
+@app.on_event("shutdown")
+def flush_background_jobs():
+    quota_persister.flush()
+    latency_recorder.flush()
+
 class SignupRequest(BaseModel):
     email: EmailStr
     password: str
@@ -36,6 +71,9 @@ class LoginRequest(BaseModel):
     email: EmailStr
     password: str
 
+class RefreshRequest(BaseModel):
+    refresh_token: str
+
 class CreateAPIKeyRequest(BaseModel):
     name: str
 
@@ -47,6 +85,25 @@ class PaymentRequest(BaseModel):
     currency: str = "usd"
     metadata: Optional[dict] = {}
 
+MAX_BATCH_OPERATIONS = 50
+
+class BatchOperation(BaseModel):
+    method: str
+    path: str
+    body: Optional[dict] = None
+
+class BatchRequest(BaseModel):
+    operations: List[BatchOperation] = Field(..., min_length=1, max_length=MAX_BATCH_OPERATIONS)
+
+def token_response(user: models.User, refresh_token: str, family_id: str) -> dict:
+    return {
+        # fam ties the access token to its login, so reuse of a refresh token revokes only that session
+        "access_token": auth.create_access_token(data={"sub": user.id, "tier": user.tier.value, "fam": family_id}),
+        "refresh_token": refresh_token,
+        "token_type": "bearer",
+        "expires_in": auth.ACCESS_TOKEN_EXPIRE_MINUTES * 60
+    }
+
 @app.post("/auth/signup")
 def signup(request: SignupRequest, db: Session = Depends(get_db)):
     """Create new user account"""
@@ -63,14 +120,13 @@ def signup(request: SignupRequest, db: Session = Depends(get_db)):
         tier=models.TierEnum.FREE
     )
     db.add(user)
+    db.flush()
+    refresh_token, session = auth.create_refresh_token(user.id, db)
     db.commit()
     db.refresh(user)
 
-    access_token = auth.create_access_token(data={"sub": user.id})
-
     return {
-        "access_token": access_token,
-        "token_type": "bearer",
+        **token_response(user, refresh_token, session.family_id),
         "user": {
             "id": user.id,
             "email": user.email,
@@ -79,17 +135,24 @@ def signup(request: SignupRequest, db: Session = Depends(get_db)):
     }
 
 @app.post("/auth/login")
-def login(request: LoginRequest, db: Session = Depends(get_db)):
+def login(request: LoginRequest, http_request: Request, db: Session = Depends(get_db)):
     """Authenticate and get access token"""
+    check_login_attempt(client_ip(http_request), request.email)
+
     user = db.query(models.User).filter(models.User.email == request.email).first()
+    if user is None:
+        # Spend the same bcrypt time as a wrong password so unknown emails cannot be told apart
+        auth.pwd_context.dummy_verify()
     if not user or not auth.verify_password(request.password, user.hashed_password):
+        record_login_failure(request.email)
         raise HTTPException(status_code=401, detail="Invalid credentials")
+    record_login_success(request.email)
 
-    access_token = auth.create_access_token(data={"sub": user.id})
+    refresh_token, session = auth.create_refresh_token(user.id, db)
+    db.commit()
 
     return {
-        "access_token": access_token,
-        "token_type": "bearer",
+        **token_response(user, refresh_token, session.family_id),
         "user": {
             "id": user.id,
             "email": user.email,
@@ -97,9 +160,13 @@ def login(request: LoginRequest, db: Session = Depends(get_db)):
         }
     }
 
-@app.get("/auth/me")
-def get_current_user_info(current_user: models.User = Depends(auth.get_current_user)):
-    """Get current user information"""
+@app.post("/auth/refresh")
+def refresh(request: RefreshRequest, db: Session = Depends(get_db)):
+    """Exchange a refresh token for a new access token and refresh token"""
+    user, refresh_token, family_id = auth.rotate_refresh_token(request.refresh_token, db)
+    return token_response(user, refresh_token, family_id)
+
+def user_info(current_user: models.User) -> dict:
     return {
         "id": current_user.id,
         "email": current_user.email,
@@ -108,14 +175,22 @@ def get_current_user_info(current_user: models.User = Depends(auth.get_current_u
         "created_at": current_user.created_at
     }
 
-@app.post("/api-keys")
+@app.get("/auth/me", dependencies=[Depends(enforce_limits)])
+def get_current_user_info(
+    request: Request,
+    current_user: models.User = Depends(auth.get_current_user)
+):
+    """Get current user information"""
+    return conditional_json_response(request, user_info(current_user))
+
+@app.post("/api-keys", dependencies=[Depends(enforce_limits)])
 def create_api_key(
     request: CreateAPIKeyRequest,
     current_user: models.User = Depends(auth.get_current_user),
     db: Session = Depends(get_db)
 ):
     """Generate new API key"""
-    key = f"sk_{secrets.token_urlsafe(32)}"
+    key = f"{auth.API_KEY_PREFIX}{secrets.token_urlsafe(32)}"
 
     api_key = models.APIKey(
         key=key,
@@ -125,6 +200,8 @@ def create_api_key(
     db.add(api_key)
     db.commit()
     db.refresh(api_key)
+    read_coalescer.invalidate(current_user.id)
+    api_key_filter.add(api_key.key)
 
     return {
         "id": api_key.id,
@@ -133,12 +210,7 @@ def create_api_key(
         "created_at": api_key.created_at
     }
 
-@app.get("/api-keys")
-def list_api_keys(
-    current_user: models.User = Depends(auth.get_current_user),
-    db: Session = Depends(get_db)
-):
-    """List all API keys"""
+def api_key_list(current_user: models.User, db: Session) -> list:
     keys = db.query(models.APIKey).filter(models.APIKey.user_id == current_user.id).all()
     return [
         {
@@ -151,13 +223,26 @@ def list_api_keys(
         for key in keys
     ]
 
-@app.delete("/api-keys/{key_id}")
+@app.get("/api-keys", dependencies=[Depends(enforce_limits)])
+def list_api_keys(
+    request: Request,
+    current_user: models.User = Depends(auth.get_current_user),
+    db: Session = Depends(get_db)
+):
+    """List all API keys"""
+    keys = read_coalescer.do(current_user.id, "/api-keys", None, lambda: api_key_list(current_user, db))
+    return conditional_json_response(request, keys)
+
+@app.delete("/api-keys/{key_id}", dependencies=[Depends(enforce_limits)])
 def delete_api_key(
     key_id: str,
     current_user: models.User = Depends(auth.get_current_user),
     db: Session = Depends(get_db)
 ):
     """Revoke API key"""
+    if not is_uuid(key_id):
+        raise HTTPException(status_code=404, detail="API key not found")
+
     key = db.query(models.APIKey).filter(
         models.APIKey.id == key_id,
         models.APIKey.user_id == current_user.id
@@ -166,12 +251,14 @@ def delete_api_key(
     if not key:
         raise HTTPException(status_code=404, detail="API key not found")
 
+    # Revoked keys stay in api_key_filter until its next rebuild; the lookup still rejects them
     key.is_active = False
     db.commit()
+    read_coalescer.invalidate(current_user.id)
 
     return {"success": True}
 
-@app.post("/subscriptions")
+@app.post("/subscriptions", dependencies=[Depends(enforce_limits)])
 def create_subscription(
     request: SubscriptionRequest,
     current_user: models.User = Depends(auth.get_current_user),
@@ -191,6 +278,7 @@ def create_subscription(
     current_user.tier = request.tier
     db.commit()
     db.refresh(subscription)
+    read_coalescer.invalidate(current_user.id)
 
     return {
         "id": subscription.id,
@@ -199,22 +287,37 @@ def create_subscription(
         "client_secret": result.get("client_secret")
     }
 
-@app.post("/payments")
+@app.post("/payments", dependencies=[Depends(enforce_limits)])
 def create_payment(
     request: PaymentRequest,
     current_user: models.User = Depends(auth.get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    idempotency_key: Optional[str] = Header(None)
 ):
     """Process payment with 2% fee capture"""
     amount_cents = int(request.amount * 100)
     metadata = {**request.metadata, "user_id": current_user.id}
 
+    # Scope the key to the user so Stripe replays the same intent on retries
     result = stripe_service.create_payment_intent(
         amount_cents,
         current_user.stripe_customer_id,
-        metadata
+        metadata,
+        idempotency_key=f"{current_user.id}:{idempotency_key}" if idempotency_key else None
     )
 
+    existing = db.query(models.Transaction).filter(
+        models.Transaction.stripe_payment_intent_id == result["id"]
+    ).first()
+    if existing:
+        return {
+            "id": existing.id,
+            "amount": existing.amount,
+            "fee_amount": existing.fee_amount,
+            "status": existing.status,
+            "client_secret": result["client_secret"]
+        }
+
     fee_amount = request.amount * stripe_service.TRANSACTION_FEE_PERCENT
 
     transaction = models.Transaction(
@@ -237,12 +340,7 @@ def create_payment(
         "client_secret": result["client_secret"]
     }
 
-@app.get("/usage")
-def get_usage(
-    current_user: models.User = Depends(auth.get_current_user),
-    db: Session = Depends(get_db)
-):
-    """Get usage statistics"""
+def usage_stats(current_user: models.User, db: Session) -> dict:
     rate_limiter = RateLimiter(current_user.id, current_user.tier)
     rate_limit_usage = rate_limiter.get_current_usage()
 
@@ -261,16 +359,93 @@ def get_usage(
         "tier": current_user.tier,
         "monthly_volume": current_user.monthly_volume,
         "rate_limits": rate_limit_usage,
+        "quota": quota_usage(current_user, db),
+        "latency": latency_summary(current_user.id),
         "calls": {
             "today": daily_calls,
             "month": monthly_calls
         }
     }
 
+# Not counted as an API call, so the ETag only changes when other traffic does
+@app.get("/usage", dependencies=[Depends(limit_usage_reads)])
+def get_usage(
+    request: Request,
+    current_user: models.User = Depends(auth.get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Get usage statistics"""
+    # Concurrent polls from the same user share one set of queries
+    stats = read_coalescer.do(current_user.id, "/usage", None, lambda: usage_stats(current_user, db))
+    return conditional_json_response(request, stats)
+
+BATCH_OPERATIONS = [
+    ("GET", re.compile(r"^/auth/me$"),
+     lambda user, db, body, params: user_info(user)),
+    ("GET", re.compile(r"^/api-keys$"),
+     lambda user, db, body, params: api_key_list(user, db)),
+    ("POST", re.compile(r"^/api-keys$"),
+     lambda user, db, body, params: create_api_key(CreateAPIKeyRequest(**(body or {})), user, db)),
+    ("DELETE", re.compile(r"^/api-keys/(?P<key_id>[^/]+)$"),
+     lambda user, db, body, params: delete_api_key(params["key_id"], user, db)),
+    ("GET", re.compile(r"^/usage$"),
+     lambda user, db, body, params: usage_stats(user, db)),
+]
+
+def run_batch_operation(operation: BatchOperation, current_user: models.User, db: Session) -> dict:
+    """Dispatch one sub-operation and capture its status code and body"""
+    method = operation.method.upper()
+    path_matched = False
+    for op_method, pattern, handler in BATCH_OPERATIONS:
+        match = pattern.match(operation.path)
+        if not match:
+            continue
+        path_matched = True
+        if op_method != method:
+            continue
+        try:
+            result = handler(current_user, db, operation.body, match.groupdict())
+            return {"status_code": 200, "body": jsonable_encoder(result)}
+        except HTTPException as e:
+            db.rollback()
+            return {"status_code": e.status_code, "body": {"detail": e.detail}}
+        except ValidationError as e:
+            db.rollback()
+            return {"status_code": 422, "body": {"detail": jsonable_encoder(e.errors())}}
+
+    if path_matched:
+        return {"status_code": 405, "body": {"detail": "Method Not Allowed"}}
+    return {"status_code": 404, "body": {"detail": "Not Found"}}
+
+@app.post("/batch", dependencies=[Depends(enforce_limits)])
+def batch(
+    request: BatchRequest,
+    current_user: models.User = Depends(auth.get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Run several operations with a single authentication and DB session"""
+    # The request itself was counted by enforce_limits; each further operation counts too
+    reserve_extra_calls(current_user, db, len(request.operations) - 1)
+    return {
+        "results": [
+            run_batch_operation(operation, current_user, db)
+            for operation in request.operations
+        ]
+    }
+
 @app.get("/health")
 def health_check():
     """Health check endpoint"""
-    return {"status": "healthy", "version": "1.0.0"}
+    return {
+        "status": "healthy",
+        "version": "1.0.0",
+        "rate_limiter": "degraded" if redis_health.degraded else "redis"
+    }
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    """Prometheus metrics for this worker"""
+    return metrics.render()
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,50 @@
+import threading
+from typing import Dict, Tuple
+
+# Per-process counters and gauges rendered in Prometheus text format.
+# Each uvicorn worker keeps its own values; the scraper sums them.
+
+_lock = threading.Lock()
+_counters: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], float] = {}
+_gauges: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], float] = {}
+_help: Dict[str, Tuple[str, str]] = {}
+
+def _key(name: str, labels: dict) -> Tuple[str, Tuple[Tuple[str, str], ...]]:
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+def describe(name: str, metric_type: str, help_text: str):
+    """Register HELP/TYPE lines for a metric"""
+    _help[name] = (metric_type, help_text)
+
+def inc(name: str, value: float = 1, **labels):
+    """Increment a counter"""
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+def set_gauge(name: str, value: float, **labels):
+    """Set a gauge to an absolute value"""
+    with _lock:
+        _gauges[_key(name, labels)] = value
+
+def get_value(name: str, **labels) -> float:
+    key = _key(name, labels)
+    with _lock:
+        return _counters.get(key, _gauges.get(key, 0))
+
+def render() -> str:
+    """Render all metrics in the Prometheus text exposition format"""
+    with _lock:
+        samples = sorted(list(_counters.items()) + list(_gauges.items()))
+
+    lines = []
+    described = set()
+    for (name, labels), value in samples:
+        if name not in described and name in _help:
+            metric_type, help_text = _help[name]
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            described.add(name)
+        label_text = ",".join(f'{k}="{v}"' for k, v in labels)
+        lines.append(f"{name}{{{label_text}}} {value}" if label_text else f"{name} {value}")
+    return "\n".join(lines) + "\n"
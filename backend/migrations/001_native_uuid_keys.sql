@@ -0,0 +1,68 @@
+-- Convert varchar UUID primary and foreign keys to the native uuid type.
+--
+-- Existing rows keep their (uuid4) values; the application assigns
+-- time-ordered UUIDv7 keys to new rows. Databases created by
+-- Base.metadata.create_all after this change already use uuid and do not
+-- need it. Run it before deploying the uuid models; on startup create_all
+-- would otherwise add tables whose uuid foreign keys cannot reference the
+-- old varchar keys.
+--
+--     psql "$DATABASE_URL" -f backend/migrations/001_native_uuid_keys.sql
+--
+-- Each ALTER rewrites its table and indexes under an ACCESS EXCLUSIVE lock,
+-- so run it in a maintenance window; usage_logs and transactions take the
+-- longest. Check first that every value parses:
+--
+--     SELECT count(*) FROM usage_logs
+--     WHERE id !~* '^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$';
+
+BEGIN;
+
+-- Foreign keys must be dropped while the referenced columns change type
+ALTER TABLE api_keys DROP CONSTRAINT IF EXISTS api_keys_user_id_fkey;
+ALTER TABLE subscriptions DROP CONSTRAINT IF EXISTS subscriptions_user_id_fkey;
+ALTER TABLE transactions DROP CONSTRAINT IF EXISTS transactions_user_id_fkey;
+ALTER TABLE usage_logs DROP CONSTRAINT IF EXISTS usage_logs_user_id_fkey;
+ALTER TABLE usage_logs DROP CONSTRAINT IF EXISTS usage_logs_api_key_id_fkey;
+ALTER TABLE IF EXISTS monthly_usage DROP CONSTRAINT IF EXISTS monthly_usage_user_id_fkey;
+ALTER TABLE IF EXISTS refresh_tokens DROP CONSTRAINT IF EXISTS refresh_tokens_user_id_fkey;
+
+ALTER TABLE users
+    ALTER COLUMN id TYPE uuid USING id::uuid;
+ALTER TABLE api_keys
+    ALTER COLUMN id TYPE uuid USING id::uuid,
+    ALTER COLUMN user_id TYPE uuid USING user_id::uuid;
+ALTER TABLE subscriptions
+    ALTER COLUMN id TYPE uuid USING id::uuid,
+    ALTER COLUMN user_id TYPE uuid USING user_id::uuid;
+ALTER TABLE transactions
+    ALTER COLUMN id TYPE uuid USING id::uuid,
+    ALTER COLUMN user_id TYPE uuid USING user_id::uuid;
+ALTER TABLE usage_logs
+    ALTER COLUMN id TYPE uuid USING id::uuid,
+    ALTER COLUMN user_id TYPE uuid USING user_id::uuid,
+    ALTER COLUMN api_key_id TYPE uuid USING api_key_id::uuid;
+ALTER TABLE IF EXISTS monthly_usage
+    ALTER COLUMN id TYPE uuid USING id::uuid,
+    ALTER COLUMN user_id TYPE uuid USING user_id::uuid;
+ALTER TABLE IF EXISTS refresh_tokens
+    ALTER COLUMN id TYPE uuid USING id::uuid,
+    ALTER COLUMN user_id TYPE uuid USING user_id::uuid;
+
+ALTER TABLE api_keys
+    ADD CONSTRAINT api_keys_user_id_fkey FOREIGN KEY (user_id) REFERENCES users (id);
+ALTER TABLE subscriptions
+    ADD CONSTRAINT subscriptions_user_id_fkey FOREIGN KEY (user_id) REFERENCES users (id);
+ALTER TABLE transactions
+    ADD CONSTRAINT transactions_user_id_fkey FOREIGN KEY (user_id) REFERENCES users (id);
+ALTER TABLE usage_logs
+    ADD CONSTRAINT usage_logs_user_id_fkey FOREIGN KEY (user_id) REFERENCES users (id),
+    ADD CONSTRAINT usage_logs_api_key_id_fkey FOREIGN KEY (api_key_id) REFERENCES api_keys (id);
+ALTER TABLE IF EXISTS monthly_usage
+    ADD CONSTRAINT monthly_usage_user_id_fkey FOREIGN KEY (user_id) REFERENCES users (id);
+ALTER TABLE IF EXISTS refresh_tokens
+    ADD CONSTRAINT refresh_tokens_user_id_fkey FOREIGN KEY (user_id) REFERENCES users (id);
+
+COMMIT;
+
+ANALYZE users, api_keys, subscriptions, transactions, usage_logs;
@@ -0,0 +1,11 @@
+-- Record which refresh token replaced each rotated one.
+--
+-- Lets a client that lost a refresh response retry with the old token
+-- during REFRESH_TOKEN_REUSE_GRACE_SECONDS. Databases created by
+-- Base.metadata.create_all after this change already have the column.
+--
+--     psql "$DATABASE_URL" -f backend/migrations/002_refresh_token_successor.sql
+--
+-- Adding a nullable column without a default does not rewrite the table.
+
+ALTER TABLE IF EXISTS refresh_tokens ADD COLUMN IF NOT EXISTS replaced_by uuid;
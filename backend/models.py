@@ -1,9 +1,12 @@
-from sqlalchemy import Column, String, Integer, Float, DateTime, Boolean, ForeignKey, Text, Enum, Index
+from sqlalchemy import Column, String, Integer, Float, DateTime, Boolean, ForeignKey, Text, Enum, Index, UniqueConstraint, Uuid
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from database import Base
+from ids import new_id
 import enum
-import uuid
+
+# Native uuid on Postgres; values stay str in Python so IDs go straight into JSON and Redis keys
+UUIDString = Uuid(as_uuid=False)
 
 class TierEnum(str, enum.Enum):
     FREE = "free"
@@ -14,7 +17,7 @@ class TierEnum(str, enum.Enum):
 class User(Base):
     __tablename__ = "users"
 
-    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    id = Column(UUIDString, primary_key=True, default=new_id)
     email = Column(String, unique=True, index=True, nullable=False)
     hashed_password = Column(String, nullable=False)
     stripe_customer_id = Column(String, unique=True, index=True)
@@ -27,6 +30,9 @@ class User(Base):
     transactions = relationship("Transaction", back_populates="user", cascade="all, delete-orphan")
     subscriptions = relationship("Subscription", back_populates="user", cascade="all, delete-orphan")
     usage_logs = relationship("UsageLog", back_populates="user", cascade="all, delete-orphan")
+    monthly_usage = relationship("MonthlyUsage", back_populates="user", cascade="all, delete-orphan")
+    refresh_tokens = relationship("RefreshToken", back_populates="user", cascade="all, delete-orphan")
+    invoice_line_items = relationship("InvoiceLineItem", back_populates="user", cascade="all, delete-orphan")
 
     __table_args__ = (
         Index('idx_user_email', 'email'),
@@ -36,9 +42,9 @@ class User(Base):
 class APIKey(Base):
     __tablename__ = "api_keys"
 
-    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    id = Column(UUIDString, primary_key=True, default=new_id)
     key = Column(String, unique=True, index=True, nullable=False)
-    user_id = Column(String, ForeignKey("users.id"), nullable=False)
+    user_id = Column(UUIDString, ForeignKey("users.id"), nullable=False)
     name = Column(String, nullable=False)
     is_active = Column(Boolean, default=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -54,8 +60,8 @@ class APIKey(Base):
 class Subscription(Base):
     __tablename__ = "subscriptions"
 
-    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
-    user_id = Column(String, ForeignKey("users.id"), nullable=False)
+    id = Column(UUIDString, primary_key=True, default=new_id)
+    user_id = Column(UUIDString, ForeignKey("users.id"), nullable=False)
     stripe_subscription_id = Column(String, unique=True, index=True)
     tier = Column(Enum(TierEnum), nullable=False)
     status = Column(String, nullable=False)
@@ -75,8 +81,8 @@ class Subscription(Base):
 class Transaction(Base):
     __tablename__ = "transactions"
 
-    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
-    user_id = Column(String, ForeignKey("users.id"), nullable=False)
+    id = Column(UUIDString, primary_key=True, default=new_id)
+    user_id = Column(UUIDString, ForeignKey("users.id"), nullable=False)
     stripe_payment_intent_id = Column(String, unique=True, index=True)
     amount = Column(Float, nullable=False)
     fee_amount = Column(Float, nullable=False)
@@ -97,9 +103,9 @@ class Transaction(Base):
 class UsageLog(Base):
     __tablename__ = "usage_logs"
 
-    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
-    user_id = Column(String, ForeignKey("users.id"), nullable=False)
-    api_key_id = Column(String, ForeignKey("api_keys.id"))
+    id = Column(UUIDString, primary_key=True, default=new_id)
+    user_id = Column(UUIDString, ForeignKey("users.id"), nullable=False)
+    api_key_id = Column(UUIDString, ForeignKey("api_keys.id"))
     endpoint = Column(String, nullable=False)
     method = Column(String, nullable=False)
     response_time_ms = Column(Integer)
@@ -112,3 +118,74 @@ class UsageLog(Base):
         Index('idx_usage_log_user', 'user_id'),
         Index('idx_usage_log_created', 'created_at'),
     )
+
+class MonthlyUsage(Base):
+    __tablename__ = "monthly_usage"
+
+    id = Column(UUIDString, primary_key=True, default=new_id)
+    user_id = Column(UUIDString, ForeignKey("users.id"), nullable=False)
+    period_start = Column(DateTime(timezone=True), nullable=False)
+    period_end = Column(DateTime(timezone=True), nullable=False)
+    calls = Column(Integer, default=0, nullable=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    user = relationship("User", back_populates="monthly_usage")
+
+    __table_args__ = (
+        UniqueConstraint('user_id', 'period_start', name='uq_monthly_usage_user_period'),
+    )
+
+class RefreshToken(Base):
+    __tablename__ = "refresh_tokens"
+
+    id = Column(UUIDString, primary_key=True, default=new_id)
+    user_id = Column(UUIDString, ForeignKey("users.id"), nullable=False)
+    token_hash = Column(String, unique=True, nullable=False)
+    family_id = Column(String, nullable=False)
+    expires_at = Column(DateTime(timezone=True), nullable=False)
+    used_at = Column(DateTime(timezone=True))
+    # The token issued when this one was rotated
+    replaced_by = Column(UUIDString)
+    revoked_at = Column(DateTime(timezone=True))
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    user = relationship("User", back_populates="refresh_tokens")
+
+    __table_args__ = (
+        Index('idx_refresh_token_hash', 'token_hash'),
+        Index('idx_refresh_token_family', 'family_id'),
+    )
+
+class InvoiceLineItem(Base):
+    __tablename__ = "invoice_line_items"
+
+    id = Column(UUIDString, primary_key=True, default=new_id)
+    user_id = Column(UUIDString, ForeignKey("users.id"), nullable=False)
+    period_start = Column(DateTime(timezone=True), nullable=False)
+    period_end = Column(DateTime(timezone=True), nullable=False)
+    transaction_volume = Column(Float, nullable=False)
+    api_calls = Column(Integer, nullable=False)
+    fee_amount = Column(Float, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    user = relationship("User", back_populates="invoice_line_items")
+
+    __table_args__ = (
+        UniqueConstraint('user_id', 'period_start', name='uq_invoice_line_item_user_period'),
+    )
+
+# One tenant id range [first_user_id, end_user_id) of a billing run; NULL bounds are open
+class BillingChunk(Base):
+    __tablename__ = "billing_chunks"
+
+    id = Column(UUIDString, primary_key=True, default=new_id)
+    period_start = Column(DateTime(timezone=True), nullable=False)
+    first_user_id = Column(UUIDString)
+    end_user_id = Column(UUIDString)
+    status = Column(String, nullable=False, default="pending")
+    line_items = Column(Integer)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    __table_args__ = (
+        Index('idx_billing_chunk_period_status', 'period_start', 'status'),
+    )
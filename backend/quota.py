@@ -0,0 +1,310 @@
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional, Tuple
+from fastapi import Depends, HTTPException, Request
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+import auth
+import metrics
+import models
+from database import SessionLocal, get_db
+from rate_limiter import (
+    RateLimiter, LimitResult, LIMIT_RATE, LIMIT_QUOTA, REDIS_ERRORS, get_redis_client, redis_health, reserve_quota
+)
+from latency import tag_request
+from stripe_service import TIER_LIMITS
+
+logger = logging.getLogger(__name__)
+
+# Fraction of the monthly allowance at which a warning header is sent
+QUOTA_SOFT_THRESHOLD = float(os.getenv("QUOTA_SOFT_THRESHOLD", "0.8"))
+# Fraction of the monthly allowance at which requests are rejected
+QUOTA_HARD_THRESHOLD = float(os.getenv("QUOTA_HARD_THRESHOLD", "1.0"))
+# Seconds between flushes of Redis counters to the monthly_usage table
+QUOTA_PERSIST_INTERVAL = float(os.getenv("QUOTA_PERSIST_INTERVAL", "60"))
+# Counters outlive their period so the last flush can still read them
+QUOTA_KEY_GRACE_SECONDS = 7 * 24 * 3600
+BILLING_PERIOD_CACHE_SECONDS = 300
+# Users whose billing period each worker keeps; the least recently used are dropped
+BILLING_PERIOD_CACHE_SIZE = int(os.getenv("BILLING_PERIOD_CACHE_SIZE", "10000"))
+
+metrics.describe("swiftapi_quota_rejections_total", "counter", "Requests rejected for an exhausted monthly quota")
+
+def quota_key(user_id: str, period_start: datetime) -> str:
+    """Monthly counter key; a new billing period starts a new key, which is the reset"""
+    return f"quota:{{{user_id}}}:{int(period_start.timestamp())}"
+
+def calendar_month(now: datetime) -> Tuple[datetime, datetime]:
+    start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    end = (start + timedelta(days=32)).replace(day=1)
+    return start, end
+
+def as_utc(value: datetime) -> datetime:
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value
+
+_period_cache: "OrderedDict[str, Tuple[float, datetime, datetime]]" = OrderedDict()
+_period_cache_lock = threading.Lock()
+
+def current_billing_period(user: models.User, db: Session) -> Tuple[datetime, datetime]:
+    """Billing period from the latest subscription, else the calendar month (UTC)
+
+    Cached per worker for a few minutes so the Subscription lookup does not
+    run on every request.
+    """
+    now = datetime.now(timezone.utc)
+    with _period_cache_lock:
+        cached = _period_cache.get(user.id)
+        if cached and cached[0] > time.monotonic() and cached[2] > now:
+            _period_cache.move_to_end(user.id)
+            return cached[1], cached[2]
+
+    subscription = db.query(models.Subscription).filter(
+        models.Subscription.user_id == user.id,
+        models.Subscription.current_period_start.isnot(None),
+        models.Subscription.current_period_end.isnot(None)
+    ).order_by(models.Subscription.current_period_start.desc()).first()
+
+    if subscription and as_utc(subscription.current_period_start) <= now < as_utc(subscription.current_period_end):
+        period = as_utc(subscription.current_period_start), as_utc(subscription.current_period_end)
+    else:
+        period = calendar_month(now)
+
+    with _period_cache_lock:
+        _period_cache[user.id] = (time.monotonic() + BILLING_PERIOD_CACHE_SECONDS, *period)
+        _period_cache.move_to_end(user.id)
+        while len(_period_cache) > BILLING_PERIOD_CACHE_SIZE:
+            _period_cache.popitem(last=False)
+    return period
+
+def monthly_allowance(tier) -> float:
+    return TIER_LIMITS.get(models.TierEnum(tier), TIER_LIMITS[models.TierEnum.FREE])
+
+def limit_headers(limiter: RateLimiter, result: LimitResult, allowance: float, period_end: datetime) -> Dict[str, str]:
+    headers = {
+        "X-RateLimit-Remaining-Minute": str(max(0, limiter.limits["requests_per_minute"] - result.minute_used)),
+    }
+    if limiter.limits["requests_per_hour"] != float('inf'):
+        headers["X-RateLimit-Remaining-Hour"] = str(max(0, limiter.limits["requests_per_hour"] - result.hour_used))
+
+    if allowance != float('inf') and result.quota_used is not None:
+        headers["X-Quota-Limit"] = str(int(allowance))
+        headers["X-Quota-Remaining"] = str(max(0, int(allowance) - result.quota_used))
+        headers["X-Quota-Reset"] = str(int(period_end.timestamp()))
+        if result.quota_used >= allowance * QUOTA_SOFT_THRESHOLD:
+            headers["X-Quota-Warning"] = f"{result.quota_used / allowance:.0%} of monthly quota used"
+    return headers
+
+def enforce_limits(
+    request: Request,
+    current_user: models.User = Depends(auth.get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Count the request against the user's rate limits and monthly quota
+
+    Both are checked and incremented by a single Redis script. Limit headers
+    are attached to the response by LimitHeadersMiddleware; admitted requests
+    are also timed by LatencyMiddleware.
+    """
+    period_start, period_end = current_billing_period(current_user, db)
+    allowance = monthly_allowance(current_user.tier)
+    limiter = RateLimiter(current_user.id, current_user.tier)
+    ttl = int((period_end - datetime.now(timezone.utc)).total_seconds()) + QUOTA_KEY_GRACE_SECONDS
+
+    result = limiter.check(quota_key(current_user.id, period_start), allowance * QUOTA_HARD_THRESHOLD, ttl)
+    headers = limit_headers(limiter, result, allowance, period_end)
+
+    if result.status == LIMIT_RATE:
+        raise HTTPException(
+            status_code=429,
+            detail="Rate limit exceeded",
+            headers={**headers, "Retry-After": str(result.retry_after)}
+        )
+    if result.status == LIMIT_QUOTA:
+        rejection = quota_exceeded(period_end)
+        rejection.headers = {**headers, **rejection.headers}
+        raise rejection
+
+    quota_persister.track(current_user.id, period_start, period_end)
+    request.state.limit_headers = headers
+    tag_request(request, current_user.id)
+
+def quota_exceeded(period_end: datetime) -> HTTPException:
+    metrics.inc("swiftapi_quota_rejections_total")
+    retry_after = max(1, int((period_end - datetime.now(timezone.utc)).total_seconds()))
+    return HTTPException(
+        status_code=429,
+        detail="Monthly quota exceeded",
+        headers={"Retry-After": str(retry_after)}
+    )
+
+def reserve_extra_calls(user: models.User, db: Session, count: int):
+    """Count additional calls made within one request (batch sub-operations) against the quota
+
+    All of them are reserved up front, or none are and the request is
+    rejected with 429, so a batch cannot run past the hard limit.
+    """
+    if count <= 0 or not redis_health.available():
+        return
+    period_start, period_end = current_billing_period(user, db)
+    allowance = monthly_allowance(user.tier)
+    ttl = int((period_end - datetime.now(timezone.utc)).total_seconds()) + QUOTA_KEY_GRACE_SECONDS
+    try:
+        reserved, _ = reserve_quota(quota_key(user.id, period_start), count, allowance * QUOTA_HARD_THRESHOLD, ttl)
+        redis_health.record_success()
+    except REDIS_ERRORS:
+        redis_health.record_failure()
+        return
+    if not reserved:
+        raise quota_exceeded(period_end)
+
+def limit_usage_reads(
+    current_user: models.User = Depends(auth.get_current_user)
+):
+    """Rate-limit reads of the caller's own usage without counting them as API calls
+
+    /usage reports the live counters; counting the read itself would change
+    its body, and so its ETag, on every poll. Reads get their own windows
+    with the tier's rate limits instead.
+    """
+    result = RateLimiter(current_user.id, current_user.tier, scope="usage").check()
+    if result.status == LIMIT_RATE:
+        raise HTTPException(
+            status_code=429,
+            detail="Rate limit exceeded",
+            headers={"Retry-After": str(result.retry_after)}
+        )
+
+class LimitHeadersMiddleware:
+    """ASGI middleware adding the headers computed by enforce_limits to the response"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_headers(message):
+            if message["type"] == "http.response.start":
+                headers = scope.get("state", {}).get("limit_headers")
+                if headers:
+                    message.setdefault("headers", [])
+                    message["headers"] = list(message["headers"]) + [
+                        (name.lower().encode("latin-1"), value.encode("latin-1"))
+                        for name, value in headers.items()
+                    ]
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
+
+class QuotaPersister:
+    """Periodically copies the Redis monthly counters of recently active users to Postgres
+
+    Every worker flushes the users it served; values are absolute counts, so
+    concurrent flushes from several workers are idempotent.
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._pending: Dict[Tuple[str, datetime], datetime] = {}
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def track(self, user_id: str, period_start: datetime, period_end: datetime):
+        with self._lock:
+            self._pending[(user_id, period_start)] = period_end
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return
+
+        entries = list(pending.items())
+        try:
+            pipe = get_redis_client().pipeline(transaction=False)
+            for (user_id, period_start), _ in entries:
+                pipe.get(quota_key(user_id, period_start))
+            counts = pipe.execute()
+        except REDIS_ERRORS:
+            # Try again on the next tick
+            with self._lock:
+                for key, period_end in entries:
+                    self._pending.setdefault(key, period_end)
+            return
+
+        rows = [
+            {
+                "user_id": user_id,
+                "period_start": period_start,
+                "period_end": period_end,
+                "calls": int(count)
+            }
+            for ((user_id, period_start), period_end), count in zip(entries, counts)
+            if count is not None
+        ]
+        if not rows:
+            return
+
+        db = SessionLocal()
+        try:
+            statement = insert(models.MonthlyUsage).values(rows)
+            statement = statement.on_conflict_do_update(
+                index_elements=["user_id", "period_start"],
+                set_={
+                    "calls": func.greatest(models.MonthlyUsage.calls, statement.excluded.calls),
+                    "updated_at": func.now()
+                }
+            )
+            db.execute(statement)
+            db.commit()
+        finally:
+            db.close()
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Failed to persist monthly quota counters")
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="quota-persister", daemon=True)
+            self._thread.start()
+
+quota_persister = QuotaPersister(QUOTA_PERSIST_INTERVAL)
+
+def quota_usage(user: models.User, db: Session) -> dict:
+    """Monthly quota summary for /usage"""
+    period_start, period_end = current_billing_period(user, db)
+    allowance = monthly_allowance(user.tier)
+    used = None
+    if redis_health.available():
+        try:
+            used = int(get_redis_client().get(quota_key(user.id, period_start)) or 0)
+            redis_health.record_success()
+        except REDIS_ERRORS:
+            redis_health.record_failure()
+    if used is None:
+        # Last persisted value while Redis is unavailable
+        row = db.query(models.MonthlyUsage).filter(
+            models.MonthlyUsage.user_id == user.id,
+            models.MonthlyUsage.period_start == period_start
+        ).first()
+        used = row.calls if row else 0
+
+    return {
+        "limit": None if allowance == float('inf') else int(allowance),
+        "used": used,
+        "remaining": None if allowance == float('inf') else max(0, int(allowance) - used),
+        "period_start": period_start,
+        "period_end": period_end
+    }
@@ -1,12 +1,24 @@
 import redis
+from redis.cluster import RedisCluster
+from redis.exceptions import RedisClusterException
+import math
 import os
-from typing import Optional
-from datetime import datetime, timedelta
+import threading
+import time
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+import metrics
 
-redis_client = redis.Redis.from_url(
-    os.getenv("REDIS_URL", "redis://localhost:6379"),
-    decode_responses=True
-)
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379")
+REDIS_CLUSTER = os.getenv("REDIS_CLUSTER", "false").lower() == "true"
+# A limiter call must never hold a request hostage: fail fast and fall back
+REDIS_SOCKET_TIMEOUT = float(os.getenv("REDIS_SOCKET_TIMEOUT", "0.05"))
+REDIS_CONNECT_TIMEOUT = float(os.getenv("REDIS_CONNECT_TIMEOUT", "0.1"))
+# Seconds to stay in degraded mode before probing Redis again
+REDIS_RETRY_INTERVAL = float(os.getenv("REDIS_RETRY_INTERVAL", "5"))
+# Number of worker processes sharing the limits while Redis is unavailable
+WORKER_COUNT = max(1, int(os.getenv("WEB_CONCURRENCY", "1")))
+
+REDIS_ERRORS = (redis.RedisError, RedisClusterException)
 
 RATE_LIMITS = {
     "free": {"requests_per_minute": 10, "requests_per_hour": 100},
@@ -15,57 +27,348 @@ RATE_LIMITS = {
     "enterprise": {"requests_per_minute": 5000, "requests_per_hour": float('inf')}
 }
 
-class RateLimiter:
-    def __init__(self, user_id: str, tier: str):
-        self.user_id = user_id
-        self.tier = tier
-        self.limits = RATE_LIMITS.get(tier, RATE_LIMITS["free"])
+# Checks the minute and hour windows (KEYS[1], KEYS[2]) and, when given, the
+# monthly quota counter (KEYS[3]), then increments all of them in one round
+# trip. KEYS share a {user_id} hash tag, so the script is atomic on a Redis
+# Cluster as well. Limits of -1 mean unlimited.
+# Returns {status, retry_after, minute, hour, quota} where status is
+# 0 = allowed, 1 = rate limited, 2 = monthly quota exhausted.
+CHECK_LIMITS_SCRIPT = """
+local minute = tonumber(redis.call('GET', KEYS[1]) or '0')
+local hour = tonumber(redis.call('GET', KEYS[2]) or '0')
+local quota = 0
+if KEYS[3] then
+    quota = tonumber(redis.call('GET', KEYS[3]) or '0')
+end
+if minute >= tonumber(ARGV[1]) then
+    return {1, math.max(redis.call('TTL', KEYS[1]), 1), minute, hour, quota}
+end
+local hour_limit = tonumber(ARGV[2])
+if hour_limit >= 0 and hour >= hour_limit then
+    return {1, math.max(redis.call('TTL', KEYS[2]), 1), minute, hour, quota}
+end
+if KEYS[3] then
+    local quota_limit = tonumber(ARGV[3])
+    if quota_limit >= 0 and quota >= quota_limit then
+        return {2, math.max(redis.call('TTL', KEYS[3]), 1), minute, hour, quota}
+    end
+    quota = redis.call('INCR', KEYS[3])
+    if quota == 1 then
+        redis.call('EXPIRE', KEYS[3], ARGV[4])
+    end
+end
+minute = redis.call('INCR', KEYS[1])
+if minute == 1 then
+    redis.call('EXPIRE', KEYS[1], 60)
+end
+hour = redis.call('INCR', KEYS[2])
+if hour == 1 then
+    redis.call('EXPIRE', KEYS[2], 3600)
+end
+return {0, 0, minute, hour, quota}
+"""
 
-    def is_allowed(self) -> tuple[bool, Optional[int]]:
-        """Check if request is allowed. Returns (allowed, retry_after_seconds)"""
-        minute_key = f"rate_limit:{self.user_id}:minute"
-        hour_key = f"rate_limit:{self.user_id}:hour"
+# Adds ARGV[1] calls to the quota counter KEYS[1] only if the total stays
+# within ARGV[2] (-1 = unlimited). Returns {1, total} when reserved and
+# {0, total} when the calls would exceed the quota.
+RESERVE_QUOTA_SCRIPT = """
+local used = tonumber(redis.call('GET', KEYS[1]) or '0')
+local count = tonumber(ARGV[1])
+local limit = tonumber(ARGV[2])
+if limit >= 0 and used + count > limit then
+    return {0, used}
+end
+used = redis.call('INCRBY', KEYS[1], count)
+if used == count then
+    redis.call('EXPIRE', KEYS[1], ARGV[3])
+end
+return {1, used}
+"""
+
+LIMIT_OK, LIMIT_RATE, LIMIT_QUOTA = 0, 1, 2
+
+class LimitResult(NamedTuple):
+    status: int
+    retry_after: Optional[int]
+    minute_used: int
+    hour_used: int
+    quota_used: Optional[int]  # None when Redis is unavailable
+
+    @property
+    def allowed(self) -> bool:
+        return self.status == LIMIT_OK
+
+metrics.describe("swiftapi_rate_limiter_degraded", "gauge",
+                 "1 while rate limiting runs on the in-process fallback")
+metrics.describe("swiftapi_rate_limiter_redis_errors_total", "counter",
+                 "Redis errors and timeouts seen by the rate limiter")
+metrics.describe("swiftapi_rate_limiter_fallback_checks_total", "counter",
+                 "Rate limit checks answered by the in-process fallback")
+metrics.describe("swiftapi_rate_limiter_resyncs_total", "counter",
+                 "Fallback counters pushed back to Redis after recovery")
+metrics.set_gauge("swiftapi_rate_limiter_degraded", 0)
+
+def create_redis_client():
+    """Standalone client, or a cluster client when REDIS_CLUSTER=true"""
+    options = dict(
+        decode_responses=True,
+        socket_timeout=REDIS_SOCKET_TIMEOUT,
+        socket_connect_timeout=REDIS_CONNECT_TIMEOUT,
+    )
+    if REDIS_CLUSTER:
+        return RedisCluster.from_url(REDIS_URL, **options)
+    return redis.Redis.from_url(REDIS_URL, **options)
+
+_redis_client = None
+_check_limits_script = None
+_reserve_quota_script = None
+
+def get_redis_client():
+    """Create the client on first use so a cluster outage at boot cannot stop the app"""
+    global _redis_client, _check_limits_script, _reserve_quota_script
+    if _redis_client is None:
+        client = create_redis_client()
+        _check_limits_script = client.register_script(CHECK_LIMITS_SCRIPT)
+        _reserve_quota_script = client.register_script(RESERVE_QUOTA_SCRIPT)
+        _redis_client = client
+    return _redis_client
+
+def reserve_quota(quota_key: str, count: int, quota_limit: float, quota_ttl: int) -> Tuple[bool, int]:
+    """Count several calls against a quota counter at once, unless they would exceed quota_limit"""
+    get_redis_client()
+    limit = -1 if quota_limit == float('inf') else int(quota_limit)
+    reserved, used = _reserve_quota_script(keys=[quota_key], args=[count, limit, quota_ttl])
+    return bool(reserved), used
+
+def rate_limit_keys(user_id: str, scope: Optional[str] = None) -> Tuple[str, str]:
+    """Minute and hour window keys, hash-tagged so both land in the same cluster slot"""
+    prefix = f"rate_limit:{{{user_id}}}:{scope}" if scope else f"rate_limit:{{{user_id}}}"
+    return f"{prefix}:minute", f"{prefix}:hour"
+
+def fair_share(limit: float) -> float:
+    """Per-worker slice of a limit while workers cannot coordinate through Redis"""
+    if limit == float('inf'):
+        return limit
+    return math.ceil(limit / WORKER_COUNT)
+
+class LocalWindowStore:
+    """Approximate in-process fixed windows used while Redis is unavailable"""
+
+    def __init__(self, prune_interval: float = 60):
+        self.prune_interval = prune_interval
+        self._windows: Dict[str, List[float]] = {}  # key -> [count, reset_at]
+        self._lock = threading.Lock()
+        self._next_prune = 0.0
+
+    def _window(self, key: str, ttl: int, now: float) -> List[float]:
+        window = self._windows.get(key)
+        if window is None or window[1] <= now:
+            self._prune(now)
+            window = self._windows[key] = [0, now + ttl]
+        return window
+
+    def _prune(self, now: float):
+        # Expired windows would otherwise pile up for every key seen during an outage
+        if now < self._next_prune:
+            return
+        self._next_prune = now + self.prune_interval
+        for key in [k for k, (_, reset_at) in self._windows.items() if reset_at <= now]:
+            del self._windows[key]
+
+    def check_and_increment(self, specs: List[Tuple[str, float, int]]) -> Tuple[Optional[int], List[int]]:
+        """Check (key, limit, ttl) windows against their fair share and count the request
 
-        minute_count = redis_client.get(minute_key)
-        hour_count = redis_client.get(hour_key)
+        Returns (retry_after, counts): retry_after is None when allowed.
+        """
+        now = time.monotonic()
+        with self._lock:
+            windows = [self._window(key, ttl, now) for key, _, ttl in specs]
+            for window, (_, limit, _) in zip(windows, specs):
+                if window[0] >= fair_share(limit):
+                    return max(int(window[1] - now), 1), [int(w[0]) for w in windows]
+            for window in windows:
+                window[0] += 1
+        return None, [int(w[0]) for w in windows]
 
-        minute_count = int(minute_count) if minute_count else 0
-        hour_count = int(hour_count) if hour_count else 0
+    def peek(self, key: str) -> Tuple[int, float]:
+        """This worker's count of a window and the seconds left in it, without creating it"""
+        now = time.monotonic()
+        with self._lock:
+            window = self._windows.get(key)
+            if window is None or window[1] <= now:
+                return 0, 0.0
+            return int(window[0]), window[1] - now
 
-        if minute_count >= self.limits["requests_per_minute"]:
-            ttl = redis_client.ttl(minute_key)
-            return False, max(ttl, 1)
+    def drain(self) -> List[Tuple[str, int, int]]:
+        """Remove and return (key, count, seconds_left) for every live window"""
+        now = time.monotonic()
+        with self._lock:
+            windows, self._windows = self._windows, {}
+        return [
+            (key, int(count), int(reset_at - now))
+            for key, (count, reset_at) in windows.items()
+            if count and reset_at > now
+        ]
 
-        if hour_count >= self.limits["requests_per_hour"]:
-            ttl = redis_client.ttl(hour_key)
-            return False, max(ttl, 1)
+local_store = LocalWindowStore()
 
-        pipe = redis_client.pipeline()
-        pipe.incr(minute_key)
-        pipe.expire(minute_key, 60)
-        pipe.incr(hour_key)
-        pipe.expire(hour_key, 3600)
+class RedisHealth:
+    """Circuit breaker that routes limiter calls to the local store while Redis is failing"""
+
+    def __init__(self, retry_interval: float):
+        self.retry_interval = retry_interval
+        self.degraded = False
+        self.retry_at = 0.0
+        self._lock = threading.Lock()
+
+    def available(self) -> bool:
+        """True when Redis should be tried; lets one probe through per retry interval"""
+        if not self.degraded:
+            return True
+        with self._lock:
+            now = time.monotonic()
+            if now < self.retry_at:
+                return False
+            self.retry_at = now + self.retry_interval
+            return True
+
+    def record_failure(self):
+        metrics.inc("swiftapi_rate_limiter_redis_errors_total")
+        with self._lock:
+            self.retry_at = time.monotonic() + self.retry_interval
+            if not self.degraded:
+                self.degraded = True
+                metrics.set_gauge("swiftapi_rate_limiter_degraded", 1)
+
+    def record_success(self):
+        if not self.degraded:
+            return
+        with self._lock:
+            if not self.degraded:
+                return
+            self.degraded = False
+        metrics.set_gauge("swiftapi_rate_limiter_degraded", 0)
+        resync_local_counts()
+
+redis_health = RedisHealth(REDIS_RETRY_INTERVAL)
+
+def resync_local_counts():
+    """Add requests counted locally during the outage back into the Redis windows"""
+    entries = local_store.drain()
+    if not entries:
+        return
+    try:
+        pipe = get_redis_client().pipeline(transaction=False)
+        for key, count, seconds_left in entries:
+            # Create the window with the remaining TTL only if Redis lost it
+            pipe.set(key, 0, ex=max(seconds_left, 1), nx=True)
+            pipe.incrby(key, count)
         pipe.execute()
+        metrics.inc("swiftapi_rate_limiter_resyncs_total")
+    except REDIS_ERRORS:
+        redis_health.record_failure()
+
+def usage_from_counts(limits: dict, minute_count, hour_count) -> dict:
+    minute_count = int(minute_count or 0)
+    hour_count = int(hour_count or 0)
+    return {
+        "minute": {
+            "used": minute_count,
+            "limit": limits["requests_per_minute"],
+            "remaining": max(0, limits["requests_per_minute"] - minute_count)
+        },
+        "hour": {
+            "used": hour_count,
+            "limit": limits["requests_per_hour"],
+            "remaining": max(0, limits["requests_per_hour"] - hour_count)
+        }
+    }
+
+def get_usage_many(users: Iterable[Tuple[str, str]]) -> Dict[str, dict]:
+    """Current usage for many (user_id, tier) pairs in one pipeline
+
+    On a cluster, the pipeline sends one batch of MGETs to each node that owns
+    any of the requested slots, so cost grows with nodes touched, not users.
+    """
+    users = list(users)
+    counts = None
+    if redis_health.available():
+        try:
+            pipe = get_redis_client().pipeline(transaction=False)
+            for user_id, _ in users:
+                pipe.mget(*rate_limit_keys(user_id))
+            counts = pipe.execute()
+            redis_health.record_success()
+        except REDIS_ERRORS:
+            redis_health.record_failure()
+    if counts is None:
+        counts = [
+            local_store.counts(list(zip(rate_limit_keys(user_id), (60, 3600))))
+            for user_id, _ in users
+        ]
 
-        return True, None
+    return {
+        user_id: usage_from_counts(RATE_LIMITS.get(tier, RATE_LIMITS["free"]), *window_counts)
+        for (user_id, tier), window_counts in zip(users, counts)
+    }
+
+class RateLimiter:
+    def __init__(self, user_id: str, tier: str, scope: Optional[str] = None):
+        self.user_id = user_id
+        self.tier = tier
+        # TierEnum members hash by name, so look limits up by value
+        self.limits = RATE_LIMITS.get(getattr(tier, "value", tier), RATE_LIMITS["free"])
+        # A scope gets its own windows with the same limits, separate from the API call windows
+        self.minute_key, self.hour_key = rate_limit_keys(user_id, scope)
+
+    def check(
+        self,
+        quota_key: Optional[str] = None,
+        quota_limit: float = float('inf'),
+        quota_ttl: int = 0
+    ) -> LimitResult:
+        """Check and count one request against the rate windows and, optionally, a quota counter"""
+        hour_limit = self.limits["requests_per_hour"]
+        if redis_health.available():
+            try:
+                get_redis_client()
+                keys = [self.minute_key, self.hour_key]
+                args = [self.limits["requests_per_minute"], -1 if hour_limit == float('inf') else hour_limit]
+                if quota_key:
+                    keys.append(quota_key)
+                    args += [-1 if quota_limit == float('inf') else int(quota_limit), quota_ttl]
+                status, retry_after, minute, hour, quota = _check_limits_script(keys=keys, args=args)
+                redis_health.record_success()
+                return LimitResult(status, retry_after or None, minute, hour, quota)
+            except REDIS_ERRORS:
+                redis_health.record_failure()
+
+        # The local store cannot know monthly totals, so the quota fails open and
+        # is only counted here for the resync after recovery
+        metrics.inc("swiftapi_rate_limiter_fallback_checks_total")
+        specs = [
+            (self.minute_key, self.limits["requests_per_minute"], 60),
+            (self.hour_key, hour_limit, 3600),
+        ]
+        if quota_key:
+            specs.append((quota_key, float('inf'), quota_ttl))
+        retry_after, counts = local_store.check_and_increment(specs)
+        minute, hour = counts[0] * WORKER_COUNT, counts[1] * WORKER_COUNT
+        return LimitResult(LIMIT_RATE if retry_after else LIMIT_OK, retry_after, minute, hour, None)
+
+    def is_allowed(self) -> tuple[bool, Optional[int]]:
+        """Check if request is allowed. Returns (allowed, retry_after_seconds)"""
+        result = self.check()
+        return result.allowed, result.retry_after
 
     def get_current_usage(self) -> dict:
         """Get current rate limit usage"""
-        minute_key = f"rate_limit:{self.user_id}:minute"
-        hour_key = f"rate_limit:{self.user_id}:hour"
-
-        minute_count = redis_client.get(minute_key) or 0
-        hour_count = redis_client.get(hour_key) or 0
-
-        return {
-            "minute": {
-                "used": int(minute_count),
-                "limit": self.limits["requests_per_minute"],
-                "remaining": max(0, self.limits["requests_per_minute"] - int(minute_count))
-            },
-            "hour": {
-                "used": int(hour_count),
-                "limit": self.limits["requests_per_hour"],
-                "remaining": max(0, self.limits["requests_per_hour"] - int(hour_count))
-            }
-        }
+        if redis_health.available():
+            try:
+                minute_count, hour_count = get_redis_client().mget(self.minute_key, self.hour_key)
+                redis_health.record_success()
+                return usage_from_counts(self.limits, minute_count, hour_count)
+            except REDIS_ERRORS:
+                redis_health.record_failure()
+        counts = local_store.counts([(self.minute_key, 60), (self.hour_key, 3600)])
+        return usage_from_counts(self.limits, *counts)
@@ -0,0 +1,93 @@
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+import metrics
+
+# How long a computed read is reused for identical requests that arrive after it finished
+COALESCE_CACHE_MS = float(os.getenv("COALESCE_CACHE_MS", "250"))
+
+metrics.describe(
+    "swiftapi_requests_collapsed_total", "counter",
+    "Reads served from another request's computation instead of running their own"
+)
+
+class _Call:
+    def __init__(self):
+        # Set when a write made the result out of date while it was being computed
+        self.stale = False
+        self.done = threading.Event()
+        self.value: Any = None
+        self.error: Optional[BaseException] = None
+
+class SingleFlight:
+    """Shares one computation between concurrent identical reads within a worker
+
+    Calls are keyed by (owner, route, params). A caller that finds an identical
+    call in flight waits for it instead of repeating the work, and results are
+    reused for a short window afterwards. invalidate() drops an owner's cached
+    results and detaches its calls in flight after a write, so reads that start
+    after the write compute afresh and the owner reads its own writes.
+    """
+
+    def __init__(self, cache_ttl_ms: float = COALESCE_CACHE_MS):
+        self.cache_ttl = cache_ttl_ms / 1000
+        self._lock = threading.Lock()
+        self._calls: Dict[Tuple[str, Hashable], _Call] = {}
+        self._cache: Dict[str, Dict[Hashable, Tuple[float, Any]]] = {}
+        self._next_prune = 0.0
+
+    def do(self, owner: str, route: str, params: Hashable, compute: Callable[[], Any]) -> Any:
+        key = (route, params)
+        now = time.monotonic()
+        with self._lock:
+            cached = self._cache.get(owner, {}).get(key)
+            if cached and cached[0] > now:
+                metrics.inc("swiftapi_requests_collapsed_total", route=route, source="cache")
+                return cached[1]
+
+            call = self._calls.get((owner, key))
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[(owner, key)] = call
+
+        if not leader:
+            call.done.wait()
+            metrics.inc("swiftapi_requests_collapsed_total", route=route, source="inflight")
+            if call.error is not None:
+                raise call.error
+            return call.value
+
+        try:
+            call.value = compute()
+        except BaseException as exc:
+            call.error = exc
+            raise
+        finally:
+            with self._lock:
+                # Results computed before a write must not outlive it
+                if not call.stale:
+                    del self._calls[(owner, key)]
+                    if call.error is None and self.cache_ttl > 0:
+                        self._prune(time.monotonic())
+                        self._cache.setdefault(owner, {})[key] = (time.monotonic() + self.cache_ttl, call.value)
+            call.done.set()
+        return call.value
+
+    def invalidate(self, owner: str):
+        """Forget cached results for an owner; reads in flight finish for their own waiters only"""
+        with self._lock:
+            self._cache.pop(owner, None)
+            for call_key in [k for k in self._calls if k[0] == owner]:
+                self._calls.pop(call_key).stale = True
+
+    def _prune(self, now: float):
+        # Drop owners whose entries have all expired, at most once per cache window
+        if now < self._next_prune:
+            return
+        self._next_prune = now + self.cache_ttl
+        for owner in [o for o, entries in self._cache.items() if all(e[0] <= now for e in entries.values())]:
+            del self._cache[owner]
+
+read_coalescer = SingleFlight()
@@ -71,14 +71,20 @@ def cancel_subscription(subscription_id: str) -> bool:
     except stripe.error.StripeError:
         return False
 
-def create_payment_intent(amount: int, customer_id: str, metadata: Dict) -> Dict:
+def create_payment_intent(
+    amount: int,
+    customer_id: str,
+    metadata: Dict,
+    idempotency_key: Optional[str] = None
+) -> Dict:
     """Create payment intent for transaction fee capture"""
     intent = stripe.PaymentIntent.create(
         amount=amount,
         currency="usd",
         customer=customer_id,
         metadata=metadata,
-        application_fee_amount=int(amount * TRANSACTION_FEE_PERCENT)
+        application_fee_amount=int(amount * TRANSACTION_FEE_PERCENT),
+        idempotency_key=idempotency_key
     )
     return {
         "id": intent.id,
@@ -0,0 +1,10 @@
+import os
+import sys
+import tempfile
+
+# database.py binds its engine to DATABASE_URL on import; point it at a throwaway
+# SQLite file unless TEST_DATABASE_URL names a database the tests may recreate
+os.environ["DATABASE_URL"] = os.getenv(
+    "TEST_DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'test.db')}"
+)
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
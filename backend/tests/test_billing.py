@@ -0,0 +1,80 @@
+from datetime import datetime, timezone
+
+import pytest
+
+import billing
+import models
+from database import Base, SessionLocal, engine
+from stripe_service import calculate_fee
+
+SEPTEMBER = datetime(2026, 9, 1, tzinfo=timezone.utc)
+OCTOBER = datetime(2026, 10, 1, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def db():
+    Base.metadata.create_all(engine)
+    session = SessionLocal()
+    yield session
+    session.close()
+    Base.metadata.drop_all(engine)
+
+
+def add_user(db, email):
+    user = models.User(email=email, hashed_password="x")
+    db.add(user)
+    db.flush()
+    return user
+
+
+def add_transaction(db, user, amount, created_at):
+    db.add(models.Transaction(user_id=user.id, amount=amount, fee_amount=0.0, status="succeeded",
+                              created_at=created_at))
+
+
+def add_quota_period(db, user, start, end, calls):
+    db.add(models.MonthlyUsage(user_id=user.id, period_start=start, period_end=end, calls=calls))
+
+
+def line_items(db):
+    return {item.user_id: item for item in db.query(models.InvoiceLineItem)}
+
+
+def test_rates_transactions_and_calls(db):
+    both = add_user(db, "both@example.com")
+    add_transaction(db, both, 1000.0, datetime(2026, 9, 10, tzinfo=timezone.utc))
+    add_transaction(db, both, 500.0, datetime(2026, 9, 20, tzinfo=timezone.utc))
+    add_transaction(db, both, 9999.0, datetime(2026, 10, 2, tzinfo=timezone.utc))
+    add_quota_period(db, both, SEPTEMBER, OCTOBER, 40)
+
+    # Subscription-anchored quota period: billed in the month it ends
+    anchored = add_user(db, "anchored@example.com")
+    add_transaction(db, anchored, 200.0, datetime(2026, 9, 15, tzinfo=timezone.utc))
+    add_quota_period(db, anchored, datetime(2026, 8, 14, tzinfo=timezone.utc),
+                     datetime(2026, 9, 14, tzinfo=timezone.utc), 3)
+    add_quota_period(db, anchored, datetime(2026, 9, 14, tzinfo=timezone.utc),
+                     datetime(2026, 10, 14, tzinfo=timezone.utc), 500)
+
+    add_user(db, "idle@example.com")
+    db.commit()
+
+    assert billing.run_billing("2026-09") == 2
+
+    items = line_items(db)
+    assert set(items) == {both.id, anchored.id}
+    assert items[both.id].transaction_volume == 1500.0
+    assert items[both.id].api_calls == 40
+    assert items[both.id].fee_amount == calculate_fee(1500.0, 40) > 0
+    assert items[anchored.id].api_calls == 3
+    assert items[anchored.id].fee_amount == calculate_fee(200.0, 3) > 0
+
+
+def test_rerun_resumes_without_rating_again(db):
+    user = add_user(db, "user@example.com")
+    add_transaction(db, user, 100.0, datetime(2026, 9, 10, tzinfo=timezone.utc))
+    add_quota_period(db, user, SEPTEMBER, OCTOBER, 10)
+    db.commit()
+
+    assert billing.run_billing("2026-09", chunk_size=1) == 1
+    assert billing.run_billing("2026-09", chunk_size=1) == 0
+    assert len(line_items(db)) == 1
@@ -0,0 +1,59 @@
+import time
+
+import pytest
+from fastapi import HTTPException
+
+import login_guard
+import rate_limiter
+from rate_limiter import LocalWindowStore
+
+
+@pytest.fixture
+def redis_down(monkeypatch):
+    """Route login checks to this worker's local windows, as during a Redis outage"""
+    monkeypatch.setattr(rate_limiter.redis_health, "degraded", True)
+    monkeypatch.setattr(rate_limiter.redis_health, "retry_at", time.monotonic() + 3600)
+    monkeypatch.setattr(login_guard, "local_login_store", LocalWindowStore())
+    monkeypatch.setattr(rate_limiter, "WORKER_COUNT", 4)
+
+
+def test_local_fallback_locks_email_at_fair_share(redis_down):
+    # Each of the 4 workers allows its own share of the limit, unscaled
+    for _ in range(rate_limiter.fair_share(login_guard.LOGIN_EMAIL_FAILURE_LIMIT)):
+        login_guard.check_login_attempt("203.0.113.5", "a@example.com")
+        login_guard.record_login_failure("a@example.com")
+
+    with pytest.raises(HTTPException) as rejected:
+        login_guard.check_login_attempt("203.0.113.5", "a@example.com")
+    assert rejected.value.status_code == 429
+    assert int(rejected.value.headers["Retry-After"]) <= login_guard.LOGIN_EMAIL_WINDOW
+
+
+def test_local_fallback_checks_do_not_create_email_windows(redis_down):
+    for i in range(50):
+        login_guard.check_login_attempt(f"203.0.113.{i}", f"user{i}@example.com")
+
+    # Only the per-IP windows that were counted exist
+    assert len(login_guard.local_login_store._windows) == 50
+    assert not any(key.startswith("login:email:") for key in login_guard.local_login_store._windows)
+
+
+def test_peek_reports_time_left_without_creating_window():
+    store = LocalWindowStore()
+    assert store.peek("k") == (0, 0.0)
+    assert store._windows == {}
+
+    store.check_and_increment([("k", 10, 60)])
+    count, left = store.peek("k")
+    assert count == 1
+    assert 59 < left <= 60
+
+
+def test_expired_windows_are_pruned():
+    store = LocalWindowStore(prune_interval=0)
+    store.check_and_increment([("old", 10, 60)])
+    store._windows["old"][1] = time.monotonic() - 1
+
+    store.check_and_increment([("new", 10, 60)])
+
+    assert list(store._windows) == ["new"]
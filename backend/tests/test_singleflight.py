@@ -0,0 +1,60 @@
+import threading
+
+from singleflight import SingleFlight
+
+
+def start_slow_read(flight, owner, value):
+    """Start a read that blocks in compute until released; returns (release, thread, result)"""
+    started, release, result = threading.Event(), threading.Event(), {}
+
+    def compute():
+        started.set()
+        release.wait(5)
+        return value
+
+    thread = threading.Thread(target=lambda: result.setdefault("value", flight.do(owner, "/api-keys", (), compute)))
+    thread.start()
+    assert started.wait(5)
+    return release, thread, result
+
+
+def test_concurrent_identical_reads_share_one_computation():
+    # A follower that arrives after the leader finished is served from the cache instead
+    flight = SingleFlight()
+    release, leader, leader_result = start_slow_read(flight, "u", "keys")
+    follower_result = {}
+    follower = threading.Thread(target=lambda: follower_result.setdefault(
+        "value", flight.do("u", "/api-keys", (), lambda: "recomputed")
+    ))
+    follower.start()
+    release.set()
+    leader.join(5)
+    follower.join(5)
+
+    assert leader_result["value"] == "keys"
+    assert follower_result["value"] == "keys"
+
+
+def test_read_after_write_does_not_join_read_in_flight():
+    flight = SingleFlight()
+    release, leader, leader_result = start_slow_read(flight, "u", "old")
+
+    flight.invalidate("u")
+    assert flight.do("u", "/api-keys", (), lambda: "new") == "new"
+
+    release.set()
+    leader.join(5)
+    assert leader_result["value"] == "old"
+    # The read that started before the write is not cached over the fresh one
+    assert flight.do("u", "/api-keys", (), lambda: "newer") == "new"
+
+
+def test_invalidate_drops_cached_results_of_owner_only():
+    flight = SingleFlight()
+    flight.do("u", "/api-keys", (), lambda: "u-old")
+    flight.do("v", "/api-keys", (), lambda: "v-old")
+
+    flight.invalidate("u")
+
+    assert flight.do("u", "/api-keys", (), lambda: "u-new") == "u-new"
+    assert flight.do("v", "/api-keys", (), lambda: "v-new") == "v-old"
@@ -0,0 +1,111 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+import metrics
+from rate_limiter import REDIS_ERRORS, get_redis_client, redis_health
+
+JWT_CACHE_SIZE = int(os.getenv("JWT_CACHE_SIZE", "10000"))
+# Cached claims are re-verified at least this often, which bounds how long a revocation takes to apply
+JWT_CACHE_MAX_AGE = float(os.getenv("JWT_CACHE_MAX_AGE", "60"))
+# How long load shedding trusts a cached API key owner's tier
+API_KEY_TIER_CACHE_SECONDS = float(os.getenv("API_KEY_TIER_CACHE_SECONDS", "60"))
+
+metrics.describe("swiftapi_jwt_cache_hits_total", "counter", "Access tokens accepted from the verified-token cache")
+metrics.describe("swiftapi_jwt_cache_misses_total", "counter", "Access tokens that needed a full signature check")
+metrics.describe("swiftapi_api_key_tier_cache_hits_total", "counter", "API key tiers found in the load shedding cache")
+metrics.describe("swiftapi_api_key_tier_cache_misses_total", "counter", "API key tiers that needed a database lookup")
+
+def token_digest(token: str) -> bytes:
+    return hashlib.blake2b(token.encode(), digest_size=16).digest()
+
+class VerifiedTokenCache:
+    """Bounded LRU of verified JWT claims keyed by token digest
+
+    Entries live until the token's exp, capped at max_age so that revocations
+    recorded in Redis are picked up by every worker.
+    """
+
+    def __init__(self, max_entries: int = JWT_CACHE_SIZE, max_age: float = JWT_CACHE_MAX_AGE,
+                 metric: str = "swiftapi_jwt_cache"):
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self.metric = metric
+        self._entries: "OrderedDict[bytes, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, token: str) -> Optional[dict]:
+        key = token_digest(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > time.time():
+                self._entries.move_to_end(key)
+                metrics.inc(f"{self.metric}_hits_total")
+                return dict(entry[0])
+            if entry is not None:
+                del self._entries[key]
+        metrics.inc(f"{self.metric}_misses_total")
+        return None
+
+    def put(self, token: str, claims: dict):
+        expires_at = time.time() + self.max_age
+        if "exp" in claims:
+            expires_at = min(expires_at, float(claims["exp"]))
+        key = token_digest(token)
+        with self._lock:
+            self._entries[key] = (dict(claims), expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def evict_subject(self, subject: str, family_id: Optional[str] = None):
+        """Drop every cached token issued to subject, or only those of one login"""
+        with self._lock:
+            for key in [
+                k for k, (claims, _) in self._entries.items()
+                if claims.get("sub") == subject and family_id in (None, claims.get("fam"))
+            ]:
+                del self._entries[key]
+
+verified_tokens = VerifiedTokenCache()
+# API key -> {"sub", "tier"} of its owner, so load shedding can classify key traffic without a query
+api_key_tiers = VerifiedTokenCache(max_age=API_KEY_TIER_CACHE_SECONDS, metric="swiftapi_api_key_tier_cache")
+
+def revocation_key(user_id: str, family_id: Optional[str] = None) -> str:
+    # Both keys of a user share a hash slot, so one MGET reads them on Redis Cluster
+    if family_id is None:
+        return f"jwt_revoked:{{{user_id}}}"
+    return f"jwt_revoked:{{{user_id}}}:{family_id}"
+
+def revoke_user_tokens(user_id: str, ttl: int, family_id: Optional[str] = None):
+    """Reject every access token issued to a user so far, or only those of one login
+
+    The cutoff is kept in Redis, in milliseconds, for ttl seconds (the access
+    token lifetime). Other workers apply it once their cached entries reach max_age.
+    """
+    verified_tokens.evict_subject(user_id, family_id)
+    try:
+        get_redis_client().set(revocation_key(user_id, family_id), int(time.time() * 1000), ex=ttl)
+        redis_health.record_success()
+    except REDIS_ERRORS:
+        redis_health.record_failure()
+
+def is_revoked(claims: dict) -> bool:
+    """True if the token was issued before a revocation cutoff of its user or login; fails open without Redis"""
+    if not redis_health.available() or "sub" not in claims:
+        return False
+    keys = [revocation_key(claims["sub"])]
+    if "fam" in claims:
+        keys.append(revocation_key(claims["sub"], claims["fam"]))
+    try:
+        cutoffs = get_redis_client().mget(keys)
+        redis_health.record_success()
+    except REDIS_ERRORS:
+        redis_health.record_failure()
+        return False
+    # Tokens issued at the cutoff's millisecond or later were issued after the revocation; whole-second
+    # iat values from older tokens round down, so they still fall before a cutoff in their second
+    issued_at_ms = float(claims.get("iat", 0)) * 1000
+    return any(cutoff is not None and issued_at_ms < int(cutoff) for cutoff in cutoffs)
@@ -0,0 +1,84 @@
+"""
+Import time and per-response decode cost of validated vs lite SDK models
+
+    python model_benchmark.py
+"""
+
+import statistics
+import subprocess
+import sys
+import timeit
+
+USER = {
+    "id": "550e8400-e29b-41d4-a716-446655440000",
+    "email": "user@example.com",
+    "tier": "pro",
+    "monthly_volume": 1250.50,
+    "created_at": "2025-10-01T12:00:00+00:00",
+}
+API_KEYS = [
+    {
+        "id": f"key_{i}",
+        "name": f"Key {i}",
+        "is_active": i % 2 == 0,
+        "created_at": "2025-10-22T12:00:00+00:00",
+        "last_used_at": None,
+    }
+    for i in range(20)
+]
+USAGE = {
+    "tier": "pro",
+    "monthly_volume": 12500.50,
+    "rate_limits": {"minute_remaining": 495, "hour_remaining": 49850},
+    "calls": {"today": 1250, "month": 45678},
+}
+
+
+def import_time(statement, runs=7):
+    """Median wall time of `statement` in a fresh interpreter, in milliseconds"""
+    code = (
+        "import time; start = time.perf_counter(); "
+        f"{statement}; "
+        "print((time.perf_counter() - start) * 1000)"
+    )
+    samples = [
+        float(subprocess.check_output([sys.executable, "-c", code]).decode())
+        for _ in range(runs)
+    ]
+    return statistics.median(samples)
+
+
+def decode_time(func, number=20000):
+    """Best-of-5 cost of one call to func, in microseconds"""
+    return min(timeit.repeat(func, number=number, repeat=5)) / number * 1e6
+
+
+def main():
+    print("Import time (median of 7 fresh interpreters)")
+    print(f"  import swiftapi                    {import_time('import swiftapi'):8.1f} ms")
+    print(f"  import swiftapi + swiftapi.models  {import_time('import swiftapi, swiftapi.models'):8.1f} ms")
+
+    from swiftapi import models, lite
+
+    cases = [
+        ("User", lambda: models.User(**USER), lambda: lite.User(**USER),
+         lambda: lite.User(**USER).email),
+        ("20 x APIKey", lambda: [models.APIKey(**k) for k in API_KEYS], lambda: [lite.APIKey(**k) for k in API_KEYS],
+         lambda: [lite.APIKey(**k).is_active for k in API_KEYS]),
+        ("Usage", lambda: models.Usage(**USAGE), lambda: lite.Usage(**USAGE),
+         lambda: lite.Usage(**USAGE).calls.month),
+        ("Usage (all fields)", lambda: models.Usage(**USAGE), lambda: lite.Usage(**USAGE),
+         lambda: lite.Usage(**USAGE).validate()),
+    ]
+
+    print("\nDecode cost per response (us)")
+    print(f"  {'payload':<20} {'validated':>10} {'lite':>10} {'lite+read':>10}")
+    for label, validated, lazy, lazy_read in cases:
+        print(
+            f"  {label:<20} {decode_time(validated):>10.2f} "
+            f"{decode_time(lazy):>10.2f} {decode_time(lazy_read):>10.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
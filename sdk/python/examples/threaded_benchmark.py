@@ -0,0 +1,75 @@
+"""
+Multithreaded throughput benchmark for the SwiftAPI Python SDK
+
+Shares one client across a thread pool and compares connection pool settings.
+
+    python threaded_benchmark.py --base-url http://localhost:8000 --threads 32 --requests 5000
+"""
+
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from swiftapi import SwiftAPI, RetryPolicy, SwiftAPIError
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(fraction * len(sorted_values)))
+    return sorted_values[index]
+
+
+def run(label, client, threads, total_requests):
+    def call(_):
+        start = time.perf_counter()
+        try:
+            client.health_check()
+            ok = True
+        except SwiftAPIError:
+            ok = False
+        return time.perf_counter() - start, ok
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        results = list(executor.map(call, range(total_requests)))
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(latency for latency, _ in results)
+    errors = sum(1 for _, ok in results if not ok)
+    print(
+        f"{label:<42} {total_requests / elapsed:>9.0f} req/s  "
+        f"p50 {percentile(latencies, 0.50) * 1000:>7.2f} ms  "
+        f"p99 {percentile(latencies, 0.99) * 1000:>7.2f} ms  "
+        f"errors {errors}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--api-key", default=None)
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+
+    no_retries = RetryPolicy(max_retries=0)
+    configurations = [
+        ("default pool (10, non-blocking)", dict()),
+        (f"thread_safe, pool {args.threads} (blocking)", dict(
+            thread_safe=True, pool_maxsize=args.threads, pool_block=True
+        )),
+        (f"thread_safe, pool {max(1, args.threads // 4)} (blocking)", dict(
+            thread_safe=True, pool_maxsize=max(1, args.threads // 4), pool_block=True
+        )),
+    ]
+
+    print(f"{args.threads} threads, {args.requests} requests against {args.base_url}\n")
+    for label, options in configurations:
+        with SwiftAPI(api_key=args.api_key, base_url=args.base_url, retry_policy=no_retries, **options) as client:
+            client.health_check()  # warm up one connection
+            run(label, client, args.threads, args.requests)
+
+
+if __name__ == "__main__":
+    main()
@@ -29,4 +29,7 @@ setup(
         "requests>=2.28.0",
         "pydantic>=2.0.0",
     ],
+    extras_require={
+        "keyring": ["keyring>=23.0"],
+    },
 )
@@ -1,6 +1,20 @@
 from .client import SwiftAPI
-from .models import TierEnum, User, APIKey, Subscription, Transaction, Usage
-from .exceptions import SwiftAPIError, AuthenticationError, RateLimitError, NotFoundError
+from .enums import TierEnum
+from .exceptions import SwiftAPIError, AuthenticationError, RateLimitError, NotFoundError, ValidationError
+from .retry import RetryPolicy, TokenBucket, ClientThrottle
+from .batch import Batch, BatchResult
+from .tokens import TokenStore, FileTokenStore, KeyringTokenStore
+
+# Pydantic models are imported on first use so that `import swiftapi` stays cheap
+_LAZY_MODELS = ("User", "APIKey", "Subscription", "Transaction", "Usage")
+
+
+def __getattr__(name):
+    if name in _LAZY_MODELS:
+        from . import models
+        return getattr(models, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 __version__ = "1.0.0"
 __all__ = [
@@ -15,4 +29,13 @@ __all__ = [
     "AuthenticationError",
     "RateLimitError",
     "NotFoundError",
+    "ValidationError",
+    "RetryPolicy",
+    "TokenBucket",
+    "ClientThrottle",
+    "Batch",
+    "BatchResult",
+    "TokenStore",
+    "FileTokenStore",
+    "KeyringTokenStore",
 ]
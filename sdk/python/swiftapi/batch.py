@@ -0,0 +1,101 @@
+from typing import Any, Callable, Dict, List, Optional, TYPE_CHECKING
+from .exceptions import SwiftAPIError, error_for_status
+
+if TYPE_CHECKING:
+    from .client import SwiftAPI
+
+
+class BatchResult:
+    """Placeholder for the outcome of one queued batch operation"""
+
+    def __init__(self, parse: Callable[[Any], Any]):
+        self._parse = parse
+        self.status_code: Optional[int] = None
+        self.body: Any = None
+
+    @property
+    def done(self) -> bool:
+        return self.status_code is not None
+
+    @property
+    def ok(self) -> bool:
+        return self.done and self.status_code < 400
+
+    def result(self) -> Any:
+        """
+        Return the parsed result of the operation
+
+        Raises:
+            SwiftAPIError: If the batch has not been sent yet, or the matching
+                SDK exception if the operation itself failed
+        """
+        if not self.done:
+            raise SwiftAPIError("Batch has not been executed yet")
+        if not self.ok:
+            detail = self.body.get('detail') if isinstance(self.body, dict) else self.body
+            raise error_for_status(str(detail), self.status_code)
+        return self._parse(self.body)
+
+
+class Batch:
+    """Queues SDK calls and sends them to POST /batch in one round trip"""
+
+    def __init__(self, client: "SwiftAPI"):
+        self.client = client
+        self.operations: List[Dict] = []
+        self.results: List[BatchResult] = []
+
+    def __enter__(self) -> "Batch":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if exc_type is None and self.operations:
+            self.execute()
+
+    def _queue(self, method: str, path: str, parse: Callable[[Any], Any], body: Optional[Dict] = None) -> BatchResult:
+        operation = {'method': method, 'path': path}
+        if body is not None:
+            operation['body'] = body
+        result = BatchResult(parse)
+        self.operations.append(operation)
+        self.results.append(result)
+        return result
+
+    def execute(self) -> List[BatchResult]:
+        """
+        Send all queued operations
+
+        Returns:
+            BatchResult objects in the order the operations were queued
+        """
+        idempotent = all(op['method'] in ('GET', 'DELETE') for op in self.operations)
+        data = self.client._request('POST', '/batch', idempotent=idempotent, json={
+            'operations': self.operations
+        })
+        for result, item in zip(self.results, data['results']):
+            result.status_code = item['status_code']
+            result.body = item['body']
+
+        self.operations = []
+        results, self.results = self.results, []
+        return results
+
+    def get_current_user(self) -> BatchResult:
+        """Queue GET /auth/me; result() returns a User"""
+        return self._queue('GET', '/auth/me', lambda data: self.client._decode('User', data))
+
+    def create_api_key(self, name: str) -> BatchResult:
+        """Queue POST /api-keys; result() returns the new APIKey"""
+        return self._queue('POST', '/api-keys', lambda data: self.client._decode('APIKey', data), {'name': name})
+
+    def list_api_keys(self) -> BatchResult:
+        """Queue GET /api-keys; result() returns a list of APIKey"""
+        return self._queue('GET', '/api-keys', lambda data: [self.client._decode('APIKey', key) for key in data])
+
+    def delete_api_key(self, key_id: str) -> BatchResult:
+        """Queue DELETE /api-keys/{key_id}; result() returns the confirmation dict"""
+        return self._queue('DELETE', f'/api-keys/{key_id}', lambda data: data)
+
+    def get_usage(self) -> BatchResult:
+        """Queue GET /usage; result() returns a Usage"""
+        return self._queue('GET', '/usage', lambda data: self.client._decode('Usage', data))
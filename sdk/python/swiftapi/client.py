@@ -1,56 +1,223 @@
 import requests
-from typing import Dict, List, Optional
-from .models import User, APIKey, Subscription, Transaction, Usage, TierEnum
-from .exceptions import SwiftAPIError, AuthenticationError, RateLimitError, NotFoundError
+import threading
+import time
+import uuid
+from requests.adapters import HTTPAdapter
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union, TYPE_CHECKING
+from .enums import TierEnum
+from .exceptions import SwiftAPIError, AuthenticationError, error_for_status
+from .retry import RetryPolicy, ClientThrottle, IDEMPOTENT_METHODS, parse_retry_after
+from .cache import ResponseCache
+from .batch import Batch
+from .tokens import TokenStore, token_expiry
+
+if TYPE_CHECKING:
+    from .models import User, APIKey, Subscription, Transaction, Usage
+
+MODEL_MODES = ('validated', 'lite')
+# Endpoints that obtain tokens and so never trigger a refresh themselves
+TOKEN_ENDPOINTS = ('/auth/signup', '/auth/login', '/auth/refresh')
 
 
 class SwiftAPI:
     """Official Python client for SwiftAPI"""
 
-    def __init__(self, api_key: Optional[str] = None, base_url: str = "https://api.getswiftapi.com"):
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        base_url: str = "https://api.getswiftapi.com",
+        retry_policy: Optional[RetryPolicy] = None,
+        rate_limit_tier: Optional[TierEnum] = None,
+        cache_size: int = 128,
+        timeout: Union[float, Tuple[float, float], None] = (5.0, 30.0),
+        pool_maxsize: int = 10,
+        pool_block: bool = False,
+        thread_safe: bool = False,
+        model_mode: str = 'validated',
+        token_store: Optional[TokenStore] = None,
+        refresh_margin: float = 60.0
+    ):
         """
         Initialize SwiftAPI client
 
         Args:
             api_key: Your SwiftAPI API key (optional for auth endpoints)
             base_url: Base URL for SwiftAPI (default: https://api.getswiftapi.com)
+            retry_policy: Retry behaviour for throttled and failed requests
+                (default: RetryPolicy(); pass RetryPolicy(max_retries=0) to disable)
+            rate_limit_tier: Throttle requests client-side to this tier's rate limits
+            cache_size: Number of GET responses kept for ETag revalidation (0 disables)
+            timeout: Default timeout in seconds, or a (connect, read) tuple
+                (default: 5s connect, 30s read; None waits forever)
+            pool_maxsize: Maximum number of pooled connections to the API host
+            pool_block: Wait for a free pooled connection instead of opening
+                extra, unpooled connections when the pool is exhausted
+            thread_safe: Give every thread its own Session on top of one shared
+                connection pool, so a single client can be used from many threads
+            model_mode: 'validated' builds Pydantic models; 'lite' builds slotted
+                objects that validate each field on first access
+            token_store: Cache for login sessions (e.g. FileTokenStore()), so that
+                new processes reuse or refresh a session instead of logging in
+            refresh_margin: Refresh the access token this many seconds before it expires
         """
+        if model_mode not in MODEL_MODES:
+            raise ValueError(f"model_mode must be one of {MODEL_MODES}, got {model_mode!r}")
+
         self.base_url = base_url.rstrip('/')
         self.api_key = api_key
         self.access_token: Optional[str] = None
-        self.session = requests.Session()
+        self.refresh_token: Optional[str] = None
+        self.token_expires_at: Optional[float] = None
+        self.token_store = token_store
+        self.refresh_margin = refresh_margin
+        self._token_key: Optional[str] = None
+        self._cached_user: Optional[Dict] = None
+        self._refresh_lock = threading.Lock()
+        self.timeout = timeout
+        self.thread_safe = thread_safe
+        self.model_mode = model_mode
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.throttle = ClientThrottle.for_tier(rate_limit_tier) if rate_limit_tier else None
+        self.response_cache = ResponseCache(cache_size) if cache_size > 0 else None
+
+        # Retries are handled by RetryPolicy, so urllib3 must not retry on its own
+        self.adapter = HTTPAdapter(pool_maxsize=pool_maxsize, pool_block=pool_block, max_retries=0)
+        self._local = threading.local()
+        self._shared_session = None if thread_safe else self._new_session()
+
+    def _new_session(self) -> requests.Session:
+        session = requests.Session()
+        session.mount('http://', self.adapter)
+        session.mount('https://', self.adapter)
+        return session
+
+    @property
+    def session(self) -> requests.Session:
+        """Session for the calling thread (shared unless thread_safe is set)"""
+        if self._shared_session is not None:
+            return self._shared_session
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self._local.session = self._new_session()
+        return session
+
+    def _auth_headers(self) -> Dict[str, str]:
+        """Authorization header for this request; never stored on the session"""
+        token = self.api_key or self.access_token
+        return {'Authorization': f'Bearer {token}'} if token else {}
+
+    def close(self) -> None:
+        """Close pooled connections"""
+        self.adapter.close()
+
+    def __enter__(self) -> "SwiftAPI":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    def _decode(self, model: str, data: Dict) -> Any:
+        """Build the named response model according to model_mode"""
+        # Imported here so that `import swiftapi` does not load pydantic
+        if self.model_mode == 'lite':
+            from . import lite as module
+        else:
+            from . import models as module
+        return getattr(module, model)(**data)
+
+    def _request(self, method: str, endpoint: str, idempotent: Optional[bool] = None, **kwargs) -> Dict:
+        """Make HTTP request to SwiftAPI and return the decoded JSON body"""
+        return self._send(method, endpoint, idempotent, **kwargs).json()
+
+    def _cached_get(self, endpoint: str, parse: Callable[[Any], Any]) -> Any:
+        """
+        GET an endpoint, revalidating a cached copy with If-None-Match
+
+        On a 304 the previously parsed object is returned without decoding
+        or validating anything.
+        """
+        if self.response_cache is None:
+            return parse(self._request('GET', endpoint))
 
-        if self.api_key:
-            self.session.headers['Authorization'] = f'Bearer {self.api_key}'
+        key = (self.api_key or self.access_token, endpoint)
+        cached = self.response_cache.get(key)
+        headers = {'If-None-Match': cached[0]} if cached else {}
 
-    def _request(self, method: str, endpoint: str, **kwargs) -> Dict:
-        """Make HTTP request to SwiftAPI"""
+        response = self._send('GET', endpoint, headers=headers)
+        if response.status_code == 304 and cached:
+            return cached[1]
+
+        value = parse(response.json())
+        etag = response.headers.get('ETag')
+        if etag:
+            self.response_cache.set(key, etag, value)
+        return value
+
+    def _send(self, method: str, endpoint: str, idempotent: Optional[bool] = None, **kwargs) -> requests.Response:
+        """Make HTTP request to SwiftAPI, retrying according to the retry policy"""
         url = f"{self.base_url}{endpoint}"
+        if idempotent is None:
+            idempotent = method.upper() in IDEMPOTENT_METHODS
 
-        if self.access_token and not self.api_key:
-            self.session.headers['Authorization'] = f'Bearer {self.access_token}'
+        if endpoint not in TOKEN_ENDPOINTS:
+            self._ensure_fresh_token()
+        kwargs['headers'] = {**self._auth_headers(), **(kwargs.get('headers') or {})}
+        kwargs.setdefault('timeout', self.timeout)
+
+        attempt = 0
+        while True:
+            if self.throttle:
+                self.throttle.acquire()
 
-        try:
-            response = self.session.request(method, url, **kwargs)
-            response.raise_for_status()
-            return response.json()
-        except requests.exceptions.HTTPError as e:
-            status_code = e.response.status_code
             try:
-                error_detail = e.response.json().get('detail', str(e))
-            except:
-                error_detail = str(e)
-
-            if status_code == 401:
-                raise AuthenticationError(error_detail, status_code)
-            elif status_code == 404:
-                raise NotFoundError(error_detail, status_code)
-            elif status_code == 429:
-                raise RateLimitError(error_detail, status_code)
-            else:
-                raise SwiftAPIError(error_detail, status_code)
-        except requests.exceptions.RequestException as e:
-            raise SwiftAPIError(str(e))
+                response = self.session.request(method, url, **kwargs)
+            except requests.exceptions.RequestException as e:
+                if self.retry_policy.should_retry_exception(e, attempt, idempotent):
+                    time.sleep(self.retry_policy.get_backoff(attempt))
+                    attempt += 1
+                    continue
+                raise SwiftAPIError(str(e))
+
+            if response.status_code < 400:
+                return response
+
+            retry_after = parse_retry_after(response.headers.get('Retry-After'))
+            # A wait longer than the policy allows (e.g. an exhausted monthly quota) is
+            # reported to the caller and must not stall later calls through the throttle
+            if response.status_code == 429 and self.throttle and not self.retry_policy.retry_after_too_long(retry_after):
+                self.throttle.penalize(retry_after)
+
+            if self.retry_policy.should_retry_status(response.status_code, attempt, idempotent, retry_after):
+                time.sleep(self.retry_policy.get_backoff(attempt, retry_after))
+                attempt += 1
+                continue
+
+            self._raise_for_status(response, retry_after)
+
+    def _raise_for_status(self, response: requests.Response, retry_after: Optional[float] = None):
+        """Map an error response to the matching SDK exception"""
+        status_code = response.status_code
+        try:
+            error_detail = response.json().get('detail', response.reason)
+        except:
+            error_detail = f"{status_code} Error: {response.reason}"
+
+        raise error_for_status(error_detail, status_code, retry_after)
+
+    def batch(self) -> Batch:
+        """
+        Queue several calls and send them in a single request
+
+        Usage:
+            with client.batch() as b:
+                key = b.create_api_key("Worker Key")
+                usage = b.get_usage()
+            print(key.result().key, usage.result().calls.month)
+
+        Returns:
+            Batch that is sent when the with-block exits
+        """
+        return Batch(self)
 
     def signup(self, email: str, password: str) -> Dict:
         """
@@ -67,38 +234,142 @@ class SwiftAPI:
             'email': email,
             'password': password
         })
-        self.access_token = response['access_token']
+        self._token_key = self._session_key(email)
+        self._set_tokens(response, response.get('user'))
         return response
 
     def login(self, email: str, password: str) -> Dict:
         """
         Authenticate and get access token
 
+        With a token_store, a cached session for this account is reused (and
+        refreshed if needed) without sending the password.
+
         Args:
             email: User email address
             password: User password
 
         Returns:
-            Dictionary with access_token and user info
+            Dictionary with access_token, refresh_token and user info
         """
+        self._token_key = self._session_key(email)
+        if self.token_store:
+            restored = self._restore_session()
+            if restored:
+                return restored
+
         response = self._request('POST', '/auth/login', json={
             'email': email,
             'password': password
         })
-        self.access_token = response['access_token']
+        self._set_tokens(response, response.get('user'))
         return response
 
-    def get_current_user(self) -> User:
+    def refresh(self) -> Dict:
+        """
+        Exchange the refresh token for a new access token and refresh token
+
+        Called automatically shortly before the access token expires.
+
+        Returns:
+            Dictionary with access_token, refresh_token and expires_in
+        """
+        if not self.refresh_token:
+            raise AuthenticationError("No refresh token; call login() first", 401)
+
+        try:
+            response = self._request('POST', '/auth/refresh', idempotent=False, json={
+                'refresh_token': self.refresh_token
+            })
+        except AuthenticationError:
+            self.refresh_token = None
+            if self.token_store and self._token_key:
+                self.token_store.clear(self._token_key)
+            raise
+
+        self._set_tokens(response, self._cached_user)
+        return response
+
+    def _session_key(self, email: str) -> str:
+        return f"{self.base_url}|{email.strip().lower()}"
+
+    def _set_tokens(self, response: Dict, user: Optional[Dict]) -> None:
+        """Adopt tokens from a signup, login or refresh response and cache them"""
+        self.access_token = response['access_token']
+        self.refresh_token = response.get('refresh_token')
+        expires_in = response.get('expires_in')
+        self.token_expires_at = time.time() + expires_in if expires_in else token_expiry(self.access_token)
+        self._cached_user = user
+
+        if self.token_store and self._token_key and self.refresh_token:
+            self.token_store.save(self._token_key, {
+                'access_token': self.access_token,
+                'refresh_token': self.refresh_token,
+                'expires_at': self.token_expires_at,
+                'user': user
+            })
+
+    def _adopt_entry(self, entry: Dict) -> None:
+        self.access_token = entry['access_token']
+        self.refresh_token = entry['refresh_token']
+        self.token_expires_at = entry['expires_at']
+        self._cached_user = entry.get('user')
+
+    def _token_is_fresh(self, expires_at: Optional[float]) -> bool:
+        return expires_at is None or expires_at - time.time() > self.refresh_margin
+
+    def _restore_session(self) -> Optional[Dict]:
+        """Reuse or refresh the cached session for _token_key; None if there is none"""
+        with self.token_store.lock(self._token_key):
+            entry = self.token_store.load(self._token_key)
+            if not entry:
+                return None
+            self._adopt_entry(entry)
+            if not self._token_is_fresh(entry['expires_at']):
+                try:
+                    self.refresh()
+                except AuthenticationError:
+                    return None
+
+        return {
+            'access_token': self.access_token,
+            'refresh_token': self.refresh_token,
+            'token_type': 'bearer',
+            'expires_in': int(self.token_expires_at - time.time()) if self.token_expires_at else None,
+            'user': self._cached_user
+        }
+
+    def _ensure_fresh_token(self) -> None:
+        """Refresh the access token if it is about to expire"""
+        if self.api_key or not self.refresh_token or self._token_is_fresh(self.token_expires_at):
+            return
+
+        with self._refresh_lock:
+            # Another thread may have refreshed while we waited
+            if self._token_is_fresh(self.token_expires_at):
+                return
+            if not (self.token_store and self._token_key):
+                self.refresh()
+                return
+
+            with self.token_store.lock(self._token_key):
+                # Another process may have refreshed already, spending our refresh token
+                entry = self.token_store.load(self._token_key)
+                if entry and entry['refresh_token'] != self.refresh_token:
+                    self._adopt_entry(entry)
+                if not self._token_is_fresh(self.token_expires_at):
+                    self.refresh()
+
+    def get_current_user(self) -> "User":
         """
         Get current user information
 
         Returns:
             User object with current user details
         """
-        data = self._request('GET', '/auth/me')
-        return User(**data)
+        return self._cached_get('/auth/me', lambda data: self._decode('User', data))
 
-    def create_api_key(self, name: str) -> APIKey:
+    def create_api_key(self, name: str) -> "APIKey":
         """
         Generate new API key
 
@@ -109,17 +380,17 @@ class SwiftAPI:
             APIKey object with the new key
         """
         data = self._request('POST', '/api-keys', json={'name': name})
-        return APIKey(**data)
+        return self._decode('APIKey', data)
 
-    def list_api_keys(self) -> List[APIKey]:
+    def list_api_keys(self) -> List["APIKey"]:
         """
         List all API keys for the current user
 
         Returns:
             List of APIKey objects
         """
-        data = self._request('GET', '/api-keys')
-        return [APIKey(**key) for key in data]
+        keys = self._cached_get('/api-keys', lambda data: [self._decode('APIKey', key) for key in data])
+        return list(keys)
 
     def delete_api_key(self, key_id: str) -> Dict:
         """
@@ -133,7 +404,7 @@ class SwiftAPI:
         """
         return self._request('DELETE', f'/api-keys/{key_id}')
 
-    def create_subscription(self, tier: TierEnum) -> Subscription:
+    def create_subscription(self, tier: TierEnum) -> "Subscription":
         """
         Upgrade or change subscription tier
 
@@ -144,41 +415,45 @@ class SwiftAPI:
             Subscription object with payment details
         """
         data = self._request('POST', '/subscriptions', json={'tier': tier.value})
-        return Subscription(**data)
+        return self._decode('Subscription', data)
 
     def create_payment(
         self,
         amount: float,
         currency: str = "usd",
-        metadata: Optional[Dict] = None
-    ) -> Transaction:
+        metadata: Optional[Dict] = None,
+        idempotency_key: Optional[str] = None
+    ) -> "Transaction":
         """
         Process payment with 2% fee capture
 
+        The request carries an Idempotency-Key header so that retries after
+        timeouts or server errors can never charge twice.
+
         Args:
             amount: Payment amount in dollars
             currency: Currency code (default: usd)
             metadata: Additional payment metadata
+            idempotency_key: Key identifying this payment (default: random UUID)
 
         Returns:
             Transaction object with payment details
         """
-        data = self._request('POST', '/payments', json={
+        data = self._request('POST', '/payments', idempotent=True, json={
             'amount': amount,
             'currency': currency,
             'metadata': metadata or {}
-        })
-        return Transaction(**data)
+        }, headers={'Idempotency-Key': idempotency_key or str(uuid.uuid4())})
+        return self._decode('Transaction', data)
 
-    def get_usage(self) -> Usage:
+    def get_usage(self) -> "Usage":
         """
         Get usage statistics for the current user
 
         Returns:
             Usage object with detailed statistics
         """
-        data = self._request('GET', '/usage')
-        return Usage(**data)
+        return self._cached_get('/usage', lambda data: self._decode('Usage', data))
 
     def health_check(self) -> Dict:
         """
@@ -0,0 +1,8 @@
+from enum import Enum
+
+
+class TierEnum(str, Enum):
+    FREE = "free"
+    INDIE = "indie"
+    PRO = "pro"
+    ENTERPRISE = "enterprise"
@@ -14,7 +14,10 @@ class AuthenticationError(SwiftAPIError):
 
 class RateLimitError(SwiftAPIError):
     """Raised when rate limit is exceeded"""
-    pass
+
+    def __init__(self, message: str, status_code: int = None, retry_after: float = None):
+        self.retry_after = retry_after
+        super().__init__(message, status_code)
 
 
 class NotFoundError(SwiftAPIError):
@@ -25,3 +28,17 @@ class NotFoundError(SwiftAPIError):
 class ValidationError(SwiftAPIError):
     """Raised when request validation fails"""
     pass
+
+
+def error_for_status(message: str, status_code: int, retry_after: float = None) -> SwiftAPIError:
+    """Build the SDK exception matching an HTTP error status"""
+    if status_code == 401:
+        return AuthenticationError(message, status_code)
+    elif status_code == 404:
+        return NotFoundError(message, status_code)
+    elif status_code == 422:
+        return ValidationError(message, status_code)
+    elif status_code == 429:
+        return RateLimitError(message, status_code, retry_after)
+    else:
+        return SwiftAPIError(message, status_code)
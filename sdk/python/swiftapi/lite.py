@@ -0,0 +1,237 @@
+"""
+Lightweight response models for high-frequency and short-lived callers
+
+Each object keeps the raw response dict and converts a field only the first
+time it is read, caching the result in a slot. Construction is a single dict
+assignment, and pydantic is never imported unless to_model() is called.
+Attribute names match swiftapi.models.
+"""
+
+from datetime import datetime
+from typing import Any, Callable, Dict
+from .enums import TierEnum
+from .exceptions import ValidationError
+
+_MISSING = object()
+
+
+class _Field:
+    __slots__ = ('convert', 'default')
+
+    def __init__(self, convert: Callable[[Any], Any], default: Any = _MISSING):
+        self.convert = convert
+        self.default = default
+
+
+def _str(value: Any) -> str:
+    if not isinstance(value, str):
+        raise TypeError(f"expected str, got {type(value).__name__}")
+    return value
+
+
+def _email(value: Any) -> str:
+    if '@' not in _str(value):
+        raise ValueError(f"{value!r} is not an email address")
+    return value
+
+
+def _int(value: Any) -> int:
+    if isinstance(value, bool) or (isinstance(value, float) and not value.is_integer()):
+        raise ValueError(f"{value!r} is not an integer")
+    return int(value)
+
+
+def _float(value: Any) -> float:
+    if isinstance(value, bool):
+        raise ValueError(f"{value!r} is not a number")
+    return float(value)
+
+
+def _bool(value: Any) -> bool:
+    if isinstance(value, bool):
+        return value
+    if value in (0, 1):
+        return bool(value)
+    raise ValueError(f"{value!r} is not a boolean")
+
+
+def _datetime(value: Any) -> datetime:
+    if isinstance(value, datetime):
+        return value
+    text = _str(value)
+    if text.endswith('Z'):
+        text = text[:-1] + '+00:00'
+    return datetime.fromisoformat(text)
+
+
+def _optional(convert: Callable[[Any], Any]) -> Callable[[Any], Any]:
+    return lambda value: None if value is None else convert(value)
+
+
+def _nested(model: type) -> Callable[[Any], Any]:
+    def convert(value: Any) -> Any:
+        if isinstance(value, model):
+            return value
+        if not isinstance(value, dict):
+            raise TypeError(f"expected object, got {type(value).__name__}")
+        return model(**value)
+    return convert
+
+
+def _mapping(convert: Callable[[Any], Any]) -> Callable[[Any], Any]:
+    def convert_all(value: Any) -> Dict[str, Any]:
+        if not isinstance(value, dict):
+            raise TypeError(f"expected object, got {type(value).__name__}")
+        return {_str(key): convert(item) for key, item in value.items()}
+    return convert_all
+
+
+class LiteModel:
+    """Base class for slotted, lazily validated response objects"""
+
+    __fields__: Dict[str, _Field] = {}
+    __slots__ = ('_data',)
+
+    def __init__(self, **data: Any):
+        self._data = data
+
+    def __getattr__(self, name: str) -> Any:
+        # Only reached while the field's slot is still empty
+        field = type(self).__fields__.get(name)
+        if field is None:
+            raise AttributeError(f"{type(self).__name__!r} object has no attribute {name!r}")
+
+        raw = self._data.get(name, _MISSING)
+        if raw is _MISSING:
+            if field.default is _MISSING:
+                raise ValidationError(f"{type(self).__name__}.{name}: field required")
+            value = field.default
+        else:
+            try:
+                value = field.convert(raw)
+            except (TypeError, ValueError) as e:
+                raise ValidationError(f"{type(self).__name__}.{name}: {e}")
+
+        object.__setattr__(self, name, value)
+        return value
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self._data!r})"
+
+    def __eq__(self, other: Any) -> bool:
+        return type(self) is type(other) and self._data == other._data
+
+    def validate(self) -> "LiteModel":
+        """Convert every field now, raising ValidationError on the first bad one"""
+        for name in type(self).__fields__:
+            getattr(self, name)
+        return self
+
+    def model_dump(self) -> Dict[str, Any]:
+        """Return all fields as a dict, converting nested models as well"""
+        result = {}
+        for name in type(self).__fields__:
+            value = getattr(self, name)
+            if isinstance(value, dict):
+                value = {key: item.model_dump() if isinstance(item, LiteModel) else item for key, item in value.items()}
+            result[name] = value.model_dump() if isinstance(value, LiteModel) else value
+        return result
+
+    def to_model(self) -> Any:
+        """Build the fully validated Pydantic model of the same name"""
+        from . import models
+        return getattr(models, type(self).__name__)(**self._data)
+
+
+class User(LiteModel):
+    __fields__ = {
+        'id': _Field(_str),
+        'email': _Field(_email),
+        'tier': _Field(TierEnum),
+        'monthly_volume': _Field(_float),
+        'created_at': _Field(_datetime),
+    }
+    __slots__ = tuple(__fields__)
+
+
+class APIKey(LiteModel):
+    __fields__ = {
+        'id': _Field(_str),
+        'name': _Field(_str),
+        'key': _Field(_optional(_str), None),
+        'is_active': _Field(_bool),
+        'created_at': _Field(_datetime),
+        'last_used_at': _Field(_optional(_datetime), None),
+    }
+    __slots__ = tuple(__fields__)
+
+
+class Subscription(LiteModel):
+    __fields__ = {
+        'id': _Field(_str),
+        'tier': _Field(TierEnum),
+        'status': _Field(_str),
+        'client_secret': _Field(_optional(_str), None),
+    }
+    __slots__ = tuple(__fields__)
+
+
+class Transaction(LiteModel):
+    __fields__ = {
+        'id': _Field(_str),
+        'amount': _Field(_float),
+        'fee_amount': _Field(_float),
+        'status': _Field(_str),
+        'currency': _Field(_str),
+        'client_secret': _Field(_optional(_str), None),
+    }
+    __slots__ = tuple(__fields__)
+
+
+class RateLimitUsage(LiteModel):
+    __fields__ = {
+        'minute_remaining': _Field(_int),
+        'hour_remaining': _Field(_int),
+    }
+    __slots__ = tuple(__fields__)
+
+
+class UsageCalls(LiteModel):
+    __fields__ = {
+        'today': _Field(_int),
+        'month': _Field(_int),
+    }
+    __slots__ = tuple(__fields__)
+
+
+_PERCENTILE_FIELDS = {
+    'count': _Field(_int),
+    'p50_ms': _Field(_optional(_float), None),
+    'p95_ms': _Field(_optional(_float), None),
+    'p99_ms': _Field(_optional(_float), None),
+}
+
+
+class LatencyPercentiles(LiteModel):
+    __fields__ = dict(_PERCENTILE_FIELDS)
+    __slots__ = tuple(__fields__)
+
+
+class LatencyUsage(LiteModel):
+    __fields__ = {
+        **_PERCENTILE_FIELDS,
+        'window_hours': _Field(_int),
+        'routes': _Field(_mapping(_nested(LatencyPercentiles)), {}),
+    }
+    __slots__ = tuple(__fields__)
+
+
+class Usage(LiteModel):
+    __fields__ = {
+        'tier': _Field(TierEnum),
+        'monthly_volume': _Field(_float),
+        'rate_limits': _Field(_nested(RateLimitUsage)),
+        'calls': _Field(_nested(UsageCalls)),
+        'latency': _Field(_optional(_nested(LatencyUsage)), None),
+    }
+    __slots__ = tuple(__fields__)
@@ -1,14 +1,7 @@
-from enum import Enum
-from typing import Optional
+from typing import Dict, Optional
 from datetime import datetime
 from pydantic import BaseModel, EmailStr
-
-
-class TierEnum(str, Enum):
-    FREE = "free"
-    INDIE = "indie"
-    PRO = "pro"
-    ENTERPRISE = "enterprise"
+from .enums import TierEnum
 
 
 class User(BaseModel):
@@ -54,8 +47,21 @@ class UsageCalls(BaseModel):
     month: int
 
 
+class LatencyPercentiles(BaseModel):
+    count: int
+    p50_ms: Optional[float] = None
+    p95_ms: Optional[float] = None
+    p99_ms: Optional[float] = None
+
+
+class LatencyUsage(LatencyPercentiles):
+    window_hours: int
+    routes: Dict[str, LatencyPercentiles] = {}
+
+
 class Usage(BaseModel):
     tier: TierEnum
     monthly_volume: float
     rate_limits: RateLimitUsage
     calls: UsageCalls
+    latency: Optional[LatencyUsage] = None
@@ -0,0 +1,187 @@
+import random
+import requests
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Dict, List, Optional
+from .enums import TierEnum
+
+
+IDEMPOTENT_METHODS = frozenset({'GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'})
+
+# Mirrors backend/rate_limiter.py RATE_LIMITS (None means unlimited)
+TIER_RATE_LIMITS = {
+    TierEnum.FREE: {"requests_per_minute": 10, "requests_per_hour": 100},
+    TierEnum.INDIE: {"requests_per_minute": 100, "requests_per_hour": 5000},
+    TierEnum.PRO: {"requests_per_minute": 500, "requests_per_hour": 50000},
+    TierEnum.ENTERPRISE: {"requests_per_minute": 5000, "requests_per_hour": None},
+}
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parse a Retry-After header (delta-seconds or HTTP-date) into seconds"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+class RetryPolicy:
+    """Jittered exponential backoff that honors Retry-After"""
+
+    def __init__(
+        self,
+        max_retries: int = 3,
+        backoff_factor: float = 0.5,
+        max_backoff: float = 30.0,
+        retry_on_status: tuple = (429, 500, 502, 503, 504),
+        respect_retry_after: bool = True,
+        max_retry_after: Optional[float] = None
+    ):
+        """
+        Initialize retry policy
+
+        Args:
+            max_retries: Maximum number of retries after the first attempt (0 disables retries)
+            backoff_factor: Base delay in seconds, doubled on every attempt
+            max_backoff: Upper bound for a single delay in seconds
+            retry_on_status: HTTP status codes that may be retried
+            respect_retry_after: Wait at least as long as the server's Retry-After header
+            max_retry_after: Longest Retry-After worth waiting for (default: max_backoff);
+                longer ones, such as an exhausted monthly quota, fail at once
+        """
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.retry_on_status = frozenset(retry_on_status)
+        self.respect_retry_after = respect_retry_after
+        self.max_retry_after = max_backoff if max_retry_after is None else max_retry_after
+
+    def retry_after_too_long(self, retry_after: Optional[float]) -> bool:
+        """True if the server asked for a longer wait than this policy will sleep"""
+        return self.respect_retry_after and retry_after is not None and retry_after > self.max_retry_after
+
+    def should_retry_status(self, status_code: int, attempt: int, idempotent: bool,
+                            retry_after: Optional[float] = None) -> bool:
+        """
+        Decide whether a response status should be retried
+
+        A 429 means the server rejected the request before doing any work, so it
+        is safe to retry for every method. Other statuses are only retried when
+        replaying the request cannot duplicate side effects.
+        """
+        if attempt >= self.max_retries or status_code not in self.retry_on_status:
+            return False
+        if self.retry_after_too_long(retry_after):
+            return False
+        return idempotent or status_code == 429
+
+    def should_retry_exception(self, exc: Exception, attempt: int, idempotent: bool) -> bool:
+        """Decide whether a transport error should be retried"""
+        if attempt >= self.max_retries:
+            return False
+        # The connection was never established, so nothing reached the server
+        if isinstance(exc, requests.exceptions.ConnectTimeout):
+            return True
+        if isinstance(exc, (requests.exceptions.ConnectionError, requests.exceptions.Timeout)):
+            return idempotent
+        return False
+
+    def get_backoff(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """Return the delay in seconds before the given retry attempt (full jitter)"""
+        ceiling = min(self.max_backoff, self.backoff_factor * (2 ** attempt))
+        delay = random.uniform(0, ceiling)
+        if self.respect_retry_after and retry_after is not None:
+            delay = max(delay, retry_after)
+        return delay
+
+
+class TokenBucket:
+    """Thread-safe token bucket refilled continuously at a fixed rate"""
+
+    def __init__(self, rate: float, capacity: float):
+        """
+        Initialize token bucket
+
+        Args:
+            rate: Tokens added per second
+            capacity: Maximum number of tokens (burst size)
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def reserve(self) -> float:
+        """Take one token and return how long the caller must wait before using it"""
+        with self._lock:
+            self._refill(time.monotonic())
+            self.tokens -= 1
+            if self.tokens >= 0:
+                return 0.0
+            return -self.tokens / self.rate
+
+    def drain(self, retry_after: Optional[float] = None) -> None:
+        """Empty the bucket after the server reported the limit as exhausted
+
+        The debt is capped at one full bucket, so waits never exceed the window
+        the bucket models.
+        """
+        with self._lock:
+            self._refill(time.monotonic())
+            debt = min(retry_after * self.rate, self.capacity) if retry_after else 0.0
+            self.tokens = min(self.tokens, -debt)
+
+
+class ClientThrottle:
+    """Client-side limiter that keeps requests under the tier's server limits"""
+
+    def __init__(self, buckets: List[TokenBucket]):
+        self.buckets = buckets
+
+    @classmethod
+    def for_tier(cls, tier: TierEnum, limits: Optional[Dict[TierEnum, Dict]] = None) -> "ClientThrottle":
+        """
+        Build a throttle matching the per-minute and per-hour limits of a tier
+
+        Args:
+            tier: Subscription tier of the account
+            limits: Override for TIER_RATE_LIMITS
+
+        Returns:
+            ClientThrottle with one bucket per limited window
+        """
+        tier_limits = (limits or TIER_RATE_LIMITS).get(TierEnum(tier), TIER_RATE_LIMITS[TierEnum.FREE])
+        buckets = []
+        for key, window in (("requests_per_minute", 60), ("requests_per_hour", 3600)):
+            limit = tier_limits.get(key)
+            if limit:
+                buckets.append(TokenBucket(rate=limit / window, capacity=limit))
+        return cls(buckets)
+
+    def acquire(self) -> float:
+        """Block until a request may be sent; returns the time spent waiting"""
+        delay = max([bucket.reserve() for bucket in self.buckets], default=0.0)
+        if delay > 0:
+            time.sleep(delay)
+        return delay
+
+    def penalize(self, retry_after: Optional[float] = None) -> None:
+        """Sync with the server after a 429 so later calls wait as well"""
+        for bucket in self.buckets:
+            bucket.drain(retry_after)
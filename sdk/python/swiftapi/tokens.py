@@ -0,0 +1,176 @@
+import base64
+import hashlib
+import json
+import os
+import tempfile
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+
+def default_cache_dir() -> str:
+    """Per-user cache directory ($XDG_CACHE_HOME/swiftapi or ~/.cache/swiftapi)"""
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'swiftapi')
+
+
+def token_expiry(access_token: str) -> Optional[float]:
+    """
+    Read the exp claim of a JWT without verifying it
+
+    Args:
+        access_token: JWT issued by SwiftAPI
+
+    Returns:
+        Expiry as a Unix timestamp, or None if the token has no readable exp claim
+    """
+    try:
+        payload = access_token.split('.')[1]
+        payload += '=' * (-len(payload) % 4)
+        return float(json.loads(base64.urlsafe_b64decode(payload))['exp'])
+    except (IndexError, KeyError, TypeError, ValueError):
+        return None
+
+
+class TokenStore(ABC):
+    """
+    Base class for caches that keep sessions across processes
+
+    Entries are dicts with access_token, refresh_token, expires_at (Unix time)
+    and user, stored under a key that names the API host and account.
+    Subclasses implement load, save and clear.
+    """
+
+    def __init__(self, lock_dir: Optional[str] = None):
+        self.lock_dir = lock_dir or default_cache_dir()
+
+    @abstractmethod
+    def load(self, key: str) -> Optional[Dict]:
+        """
+        Args:
+            key: Session key
+
+        Returns:
+            The stored entry, or None if there is none
+        """
+
+    @abstractmethod
+    def save(self, key: str, tokens: Dict) -> None:
+        """
+        Args:
+            key: Session key
+            tokens: Entry to store, replacing any earlier one
+        """
+
+    @abstractmethod
+    def clear(self, key: str) -> None:
+        """
+        Args:
+            key: Session key whose entry is removed, if present
+        """
+
+    @contextmanager
+    def lock(self, key: str) -> Iterator[None]:
+        """
+        Hold an inter-process lock on key
+
+        Refresh tokens are single-use, so processes sharing a cache take this
+        lock while they refresh a session. Without fcntl (Windows) it is a no-op.
+        """
+        if fcntl is None:
+            yield
+            return
+
+        os.makedirs(self.lock_dir, mode=0o700, exist_ok=True)
+        name = hashlib.sha256(key.encode()).hexdigest()[:16]
+        with open(os.path.join(self.lock_dir, f'{name}.lock'), 'a') as handle:
+            fcntl.flock(handle, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(handle, fcntl.LOCK_UN)
+
+
+class FileTokenStore(TokenStore):
+    """Tokens in a JSON file that only the current user can read"""
+
+    def __init__(self, path: Optional[str] = None):
+        """
+        Args:
+            path: Cache file (default: ~/.cache/swiftapi/tokens.json)
+        """
+        self.path = path or os.path.join(default_cache_dir(), 'tokens.json')
+        super().__init__(os.path.dirname(os.path.abspath(self.path)))
+
+    def _read(self) -> Dict[str, Dict]:
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def _write(self, entries: Dict[str, Dict]) -> None:
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+        # mkstemp creates the file with mode 0600; the rename makes the update atomic
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.tokens-')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(entries, f)
+            os.replace(temp_path, self.path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+
+    def load(self, key: str) -> Optional[Dict]:
+        return self._read().get(key)
+
+    def save(self, key: str, tokens: Dict) -> None:
+        # Other accounts share the file, so the read-modify-write is locked as a whole
+        with self.lock(self.path):
+            entries = self._read()
+            entries[key] = tokens
+            self._write(entries)
+
+    def clear(self, key: str) -> None:
+        with self.lock(self.path):
+            entries = self._read()
+            if entries.pop(key, None) is not None:
+                self._write(entries)
+
+
+class KeyringTokenStore(TokenStore):
+    """Tokens in the system keyring (requires the optional keyring package)"""
+
+    def __init__(self, service: str = 'swiftapi'):
+        """
+        Args:
+            service: Keyring service name the entries are stored under
+        """
+        try:
+            import keyring
+        except ImportError as e:
+            raise ImportError(
+                "KeyringTokenStore requires the keyring package: pip install swiftapi[keyring]"
+            ) from e
+        super().__init__()
+        self._keyring = keyring
+        self.service = service
+
+    def load(self, key: str) -> Optional[Dict]:
+        value = self._keyring.get_password(self.service, key)
+        return json.loads(value) if value else None
+
+    def save(self, key: str, tokens: Dict) -> None:
+        self._keyring.set_password(self.service, key, json.dumps(tokens))
+
+    def clear(self, key: str) -> None:
+        try:
+            self._keyring.delete_password(self.service, key)
+        except self._keyring.errors.PasswordDeleteError:
+            pass